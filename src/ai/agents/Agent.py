@@ -1,35 +1,123 @@
 import time
+import asyncio
 import logging
-from typing import List
-from langchain_ollama import OllamaLLM
 from ai.models import LLMConfig
-from ai.models.novel.Schema import AgentResponse
-from typing import Dict, Any, Optional
-import requests
+from ai.backend.ClientRegistry import ClientRegistry, PooledClient
+from ai.backend.EndpointPool import EndpointPool
+from ai.backend.ModelResidency import ModelResidency
+from ai.models.novel.Schema import AgentResponse, GenerationStats
+from ai.agents.TokenStream import TokenStream, stats_from_response
+from ai.agents.JsonStream import JsonItemStream, StreamItem, item_schema, parse_structured, schema_error
+from ai.agents.ResponseCache import ResponseCache
+from ai.agents.AgentMemory import AgentMemory
+from ai.agents.TokenBudget import TokenBudget
+from ai.agents.Tokens import estimate_tokens, truncate_to_tokens
+from ai.tracing.Tracer import Span, tracer, KIND_LLM
+import os
+from typing import Callable, Dict, Any, List, Optional
+from dataclasses import asdict
 import json
 
-from ollama import generate as ollama_generate
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Attempts to regenerate one invalid element of a streamed array before the stage fails
+MAX_ITEM_REPAIRS = 2
+# Retries with a doubled output budget when a response stops at its token limit
+LENGTH_RETRIES = 1
+
+
+class TruncatedResponseError(RuntimeError):
+    """The model stopped at num_predict or the end of its context (done_reason "length")"""
+    pass
+
+
 class Agent:
-    def __init__(self, name: str, role: str, base_prompt: str, llmConfig: LLMConfig):
+    def __init__(self, name: str, role: str, base_prompt: str, llmConfig: LLMConfig,
+                 memoryTokens: int = 4000, useMemory: bool = False, memoryContextTokens: int = 1000):
         self.name = name
         self.role = role
         self.base_prompt = base_prompt
-        self.memory: List[str] = []
+        self.memory: AgentMemory = AgentMemory(maxTokens=memoryTokens)
+        # Inject relevant past outputs into prompts, off by default so prompts stay reproducible
+        self.useMemory = useMemory
+        self.memoryContextTokens = memoryContextTokens
         self.llmConfig: LLMConfig = llmConfig
+        self.cache: Optional[ResponseCache] = ResponseCache.for_config(llmConfig)
+        self.pool: EndpointPool = EndpointPool.for_config(llmConfig)
+        self.budget: TokenBudget = TokenBudget.for_config(llmConfig)
+
+    def timed_generate(self, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None, stream: bool = False, prefix: str = None, outputTokens: int = None,
+                       onToken: Callable[[str], None] = None, onRetry: Callable[[], None] = None) -> AgentResponse:
+        """Generate and write the response to the output file. A response cut at its token limit is
+        generated again with a doubled budget, onRetry() is called first so the tokens already passed
+        to onToken can be discarded"""
+        with tracer.span("llm.generate", KIND_LLM, **self.span_attributes(file_name, responseSchema, stream)) as span:
+            for attempt in range(LENGTH_RETRIES + 1):
+                try:
+                    response = self._timed_generate(prompt, file_name, responseSchema, stream, prefix, outputTokens, onToken)
+                    break
+                except TruncatedResponseError as error:
+                    outputTokens = self.retry_budget(error, attempt, outputTokens, onRetry)
+            self.trace_response(span, response, file_name)
+        return response
+
+    async def atimed_generate(self, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None, stream: bool = False, prefix: str = None, outputTokens: int = None,
+                              onToken: Callable[[str], None] = None, onRetry: Callable[[], None] = None) -> AgentResponse:
+        """Async variant of timed_generate, does not block the event loop while the model generates"""
+        with tracer.span("llm.generate", KIND_LLM, **self.span_attributes(file_name, responseSchema, stream)) as span:
+            for attempt in range(LENGTH_RETRIES + 1):
+                try:
+                    response = await self._atimed_generate(prompt, file_name, responseSchema, stream, prefix, outputTokens, onToken)
+                    break
+                except TruncatedResponseError as error:
+                    outputTokens = self.retry_budget(error, attempt, outputTokens, onRetry)
+            self.trace_response(span, response, file_name)
+        return response
+
+    def retry_budget(self, error: TruncatedResponseError, attempt: int, outputTokens: Optional[int], onRetry: Callable[[], None] = None) -> int:
+        """Doubled output budget for the next attempt, re-raises error once the retries are used up"""
+        if attempt >= LENGTH_RETRIES:
+            raise error
+        outputTokens = self.output_budget(outputTokens) * 2
+        logger.warning(f"{error}, retrying with {outputTokens} output tokens.")
+        span = tracer.current_span()
+        if span is not None:
+            span.set(lengthRetries=attempt + 1)
+        if onRetry is not None:
+            onRetry()
+        return outputTokens
 
-    def timed_generate(self, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None) -> AgentResponse:
+    def span_attributes(self, file_name: str, responseSchema: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        return {"agent": self.name, "role": self.role, "model": self.llmConfig.model, "file": file_name, "structured": responseSchema is not None, "stream": stream}
+
+    def trace_response(self, span: Span, response: AgentResponse, file_name: str):
+        """Copy Ollama's counters and durations onto the llm span"""
+        span.set(cached=response.metadata.get("cached", False), **response.metadata.get("stats", {}))
+        try:
+            span.set(bytesWritten=os.path.getsize(self.output_path(file_name)))
+        except OSError:
+            pass
+
+    def _timed_generate(self, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None, stream: bool = False, prefix: str = None, outputTokens: int = None, onToken: Callable[[str], None] = None) -> AgentResponse:
         start_time = time.time()
         logger.info(f"{self.name} agent generating content...")
         
-        response: AgentResponse = self.generate_structured(prompt, responseSchema) if responseSchema is not None else self.generate(prompt)
-        
-        with open(f"{self.llmConfig.modelStore}/{file_name}-{self.name}.md", 'w') as f:
-            f.write(response.content if responseSchema is None else json.dumps(response.content, indent=4))
+        cacheKey = self.cache_key(prompt, responseSchema, prefix, outputTokens) if stream else None
+        cached = self.cached_response(cacheKey, responseSchema)
+        if cached is not None:
+            response = cached
+            self.write_response(response, file_name, responseSchema)
+        elif stream:
+            tokens = self.stream(prompt, file_name, responseSchema, prefix, outputTokens)
+            for token in tokens:
+                if onToken is not None:
+                    onToken(token)
+            response = self._streamed_response(tokens, file_name, responseSchema, cacheKey)
+        else:
+            response: AgentResponse = self.generate_structured(prompt, responseSchema, prefix, outputTokens) if responseSchema is not None else self.generate(prompt, prefix=prefix, outputTokens=outputTokens)
+            self.write_response(response, file_name, responseSchema)
             
         logger.info(f"{self.name} agent generated content.")
         
@@ -38,45 +126,410 @@ class Agent:
         
         return response
 
-    def generate(self, prompt: str, responseSchema: Dict[str, Any] = None) -> AgentResponse:
+    async def _atimed_generate(self, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None, stream: bool = False, prefix: str = None, outputTokens: int = None, onToken: Callable[[str], None] = None) -> AgentResponse:
+        start_time = time.time()
+        logger.info(f"{self.name} agent generating content...")
+
+        cacheKey = self.cache_key(prompt, responseSchema, prefix, outputTokens) if stream else None
+        cached = self.cached_response(cacheKey, responseSchema)
+        if cached is not None:
+            response = cached
+            self.write_response(response, file_name, responseSchema)
+        elif stream:
+            tokens = self.astream(prompt, file_name, responseSchema, prefix, outputTokens)
+            async for token in tokens:
+                if onToken is not None:
+                    onToken(token)
+            response = self._streamed_response(tokens, file_name, responseSchema, cacheKey)
+        else:
+            response: AgentResponse = await self.agenerate_structured(prompt, responseSchema, prefix, outputTokens) if responseSchema is not None else await self.agenerate(prompt, prefix=prefix, outputTokens=outputTokens)
+            self.write_response(response, file_name, responseSchema)
+
+        elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+        logger.info(f"{self.name} agent generated content in {elapsed_time:.2f}ms.")
+
+        return response
+
+    def stream(self, prompt: str, file_name: str = None, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> TokenStream:
+        """Stream tokens as they are generated, appending them to the output file when file_name is given"""
+        request = self.build_request(prompt, prefix, outputTokens, structured=responseSchema is not None)
+        source = self.pool.iterate(
+            self.llmConfig.model,
+            lambda url: self.get_client(url).generate(format=responseSchema, stream=True, **request)
+        )
+        return TokenStream(source, self.output_path(file_name) if file_name else None)
+
+    def astream(self, prompt: str, file_name: str = None, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> TokenStream:
+        """Async variant of stream, iterate the result with `async for`"""
+        request = self.build_request(prompt, prefix, outputTokens, structured=responseSchema is not None)
+        source = self.pool.aiterate(
+            self.llmConfig.model,
+            lambda url: self.get_client(url).agenerate(format=responseSchema, stream=True, **request)
+        )
+        return TokenStream(source, self.output_path(file_name) if file_name else None)
+
+    def _streamed_response(self, tokens: TokenStream, file_name: str, responseSchema: Dict[str, Any] = None, cacheKey: str = None) -> AgentResponse:
+        stats = tokens.stats
+        ttft = f"{stats.ttftMs:.2f}ms" if stats.ttftMs is not None else "n/a"
+        rate = f"{stats.tokensPerSec:.2f}" if stats.tokensPerSec is not None else "n/a"
+        logger.info(f"{self.name} agent first token in {ttft}, {rate} tokens/sec.")
+        if responseSchema is None:
+            return self._text_response(tokens.text, stats, cacheKey)
+        response = self._structured_response(tokens.text, stats, cacheKey, responseSchema)
+        # Replace the raw streamed JSON with the indented form written by the non streaming path
+        self.write_response(response, file_name, responseSchema)
+        return response
+
+    async def atimed_generate_items(self, prompt: str, file_name: str, responseSchema: Dict[str, Any], arrayKey: str,
+                                    onItem: Callable[[int, Any], None] = None, prefix: str = None, outputTokens: int = None,
+                                    maxRepairs: int = MAX_ITEM_REPAIRS, onToken: Callable[[str], None] = None,
+                                    onRetry: Callable[[], None] = None, minItems: int = None) -> AgentResponse:
+        """Streamed structured generation handing out the elements of the arrayKey array as they complete.
+
+        Every element is parsed and validated against its schema the moment it
+        closes and passed to onItem(index, element), so callers can start on
+        the first element while the rest is generated. An element that fails
+        is repaired on its own (json_repair, then up to maxRepairs requests for
+        just that element) instead of regenerating the whole document. An array
+        that closed with fewer than minItems elements is completed the same way,
+        up to maxRepairs requests for only the missing elements, and is kept
+        short when those fail too.
+
+        A response cut at its token limit is generated again with a doubled
+        budget like timed_generate. onRetry() is called before that, the tokens
+        and elements handed out so far are then stale and the retry hands out
+        elements again from index 0.
+        """
+        with tracer.span("llm.generate", KIND_LLM, **self.span_attributes(file_name, responseSchema, True)) as span:
+            start_time = time.time()
+            logger.info(f"{self.name} agent generating {arrayKey} items...")
+            for attempt in range(LENGTH_RETRIES + 1):
+                # Per attempt, a retried response is cached under its doubled budget
+                cacheKey = self.cache_key(prompt, responseSchema, prefix, outputTokens)
+                response = self.cached_response(cacheKey, responseSchema)
+                if response is not None:
+                    for index, item in enumerate(response.content.get(arrayKey) or []):
+                        if onItem is not None:
+                            onItem(index, item)
+                    break
+                try:
+                    response = await self._agenerate_items(prompt, file_name, responseSchema, arrayKey, onItem, prefix, outputTokens, maxRepairs, cacheKey, onToken, minItems)
+                    break
+                except TruncatedResponseError as error:
+                    outputTokens = self.retry_budget(error, attempt, outputTokens, onRetry)
+            self.write_response(response, file_name, responseSchema)
+            span.set(repairedItems=response.metadata.get("repairedItems"))
+            self.trace_response(span, response, file_name)
+        logger.info(f"{self.name} agent generated content in {(time.time() - start_time) * 1000:.2f}ms.")
+        return response
+
+    async def _agenerate_items(self, prompt: str, file_name: str, responseSchema: Dict[str, Any], arrayKey: str, onItem, prefix: str,
+                               outputTokens: int, maxRepairs: int, cacheKey: Optional[str], onToken: Callable[[str], None] = None,
+                               minItems: int = None) -> AgentResponse:
+        schema = item_schema(responseSchema, arrayKey)
+        parser = JsonItemStream(arrayKey, schema)
+        tokens = self.astream(prompt, file_name, responseSchema, prefix, outputTokens)
+        repairs = []
+
+        async def repair(item: StreamItem):
+            logger.warning(f"{self.name} agent {arrayKey}[{item.index}] is invalid ({item.error}), repairing it")
+            item.value = await self.arepair_item(prompt, arrayKey, item, schema, prefix, maxRepairs)
+            item.error = None
+            if onItem is not None:
+                onItem(item.index, item.value)
+
+        def handle(items: List[StreamItem]):
+            for item in items:
+                if not item.valid:
+                    # Repair while the rest of the array is still streaming
+                    repairs.append(asyncio.ensure_future(repair(item)))
+                elif onItem is not None:
+                    onItem(item.index, item.value)
+
         try:
-            full_prompt = f"{self.base_prompt}\n\nRole: {self.role}\n\n{prompt}"
-            
-            self.llm = OllamaLLM(
-                model=self.llmConfig.model,
-                base_url=self.llmConfig.base_url,
-                temperature=self.llmConfig.openAIConfig.temperature,
-                max_tokens=8000
-            )
-
-            content = self.llm.invoke(full_prompt)
-            
-            self.memory.append(content)
+            async for token in tokens:
+                if onToken is not None:
+                    onToken(token)
+                handle(parser.feed(token))
+            handle(parser.finish())
+            await asyncio.gather(*repairs)
+        finally:
+            for task in repairs:
+                task.cancel()
 
-            response = AgentResponse(content=content, metadata={"agent": self.name, "role": self.role, "json": False})
-            return response
-            
+        # A response cut at its limit must not be closed up by json_repair and pass for a complete one
+        self.check_complete(tokens.stats)
+        try:
+            document = parse_structured(tokens.text, responseSchema, repair=parser.closed)
+        except ValueError:
+            document = None
+        if document is None and not parser.closed:
+            raise ValueError(f"{self.name} agent response ended before its {arrayKey} array closed, after {len(parser.items)} elements")
+        if repairs or not isinstance(document, dict):
+            # Keep whatever else the model produced around the array, with the repaired elements in it
+            document = document if isinstance(document, dict) else {}
+            document[arrayKey] = parser.values()
+        values = document.get(arrayKey) or []
+        completed = 0
+        if minItems is not None and len(values) < minItems:
+            extra = await self.acomplete_items(prompt, arrayKey, values, minItems, schema, prefix, maxRepairs)
+            for index, value in enumerate(extra, start=len(values)):
+                if onItem is not None:
+                    onItem(index, value)
+            document[arrayKey] = values + extra
+            completed = len(extra)
+        content = json.dumps(document)
+        response = self._structured_response(content, tokens.stats, cacheKey, responseSchema)
+        response.metadata["repairedItems"] = len(repairs)
+        response.metadata["completedItems"] = completed
+        return response
+
+    async def acomplete_items(self, prompt: str, arrayKey: str, values: List[Any], count: int, schema: Dict[str, Any], prefix: str = None,
+                              maxRepairs: int = MAX_ITEM_REPAIRS) -> List[Any]:
+        """Elements len(values)+1..count of an array that closed short, generated without the ones already there.
+        Returns what it got within maxRepairs requests, possibly fewer than asked for"""
+        extra = []
+        responseSchema = {"type": "object", "properties": {arrayKey: {"type": "array", "items": schema}}, "required": [arrayKey]}
+        for attempt in range(1, maxRepairs + 1):
+            first = len(values) + len(extra) + 1
+            completePrompt = f"""{prompt}
+
+            Your answer stopped after element {first - 1} of the {count} elements of "{arrayKey}", the last one was:
+            {json.dumps((values + extra)[-1]) if values or extra else '-'}
+
+            Return only elements {first} to {count} of "{arrayKey}", continuing from there, as {{"{arrayKey}": [...]}}.
+        """
+            response = await self.acall_llm(format=responseSchema, stream=False, **self.build_request(completePrompt, prefix, structured=True))
+            try:
+                elements = (parse_structured(response.response, responseSchema) or {}).get(arrayKey) or []
+            except ValueError as parseError:
+                logger.warning(f"{self.name} agent could not parse the missing {arrayKey}: {parseError}")
+                continue
+            extra += elements[:count - first + 1]
+            if len(values) + len(extra) >= count:
+                logger.info(f"{self.name} agent completed {arrayKey} to {count} elements in {attempt} request(s).")
+                return extra
+        logger.warning(f"{self.name} agent {arrayKey} has {len(values) + len(extra)} of {count} elements, continuing with those.")
+        return extra
+
+    async def arepair_item(self, prompt: str, arrayKey: str, item: StreamItem, schema: Dict[str, Any], prefix: str = None,
+                           maxRepairs: int = MAX_ITEM_REPAIRS) -> Any:
+        """Fix one invalid array element, locally when json_repair can, otherwise by regenerating only that element"""
+        try:
+            repaired = parse_structured(item.raw, schema)
+            if not schema_error(repaired, schema):
+                return repaired
+        except ValueError:
+            pass
+        error = item.error
+        for attempt in range(1, maxRepairs + 1):
+            repairPrompt = f"""{prompt}
+
+            Element {item.index + 1} of "{arrayKey}" in your answer was invalid: {error}
+            Invalid element: {item.raw}
+
+            Return only a corrected version of that one element as JSON.
+        """
+            response = await self.acall_llm(format=schema, stream=False, **self.build_request(repairPrompt, prefix, structured=True))
+            try:
+                value = parse_structured(response.response, schema)
+                error = schema_error(value, schema)
+            except ValueError as parseError:
+                error = f"invalid JSON: {parseError}"
+            if error is None:
+                logger.info(f"{self.name} agent repaired {arrayKey}[{item.index}] in {attempt} request(s).")
+                return value
+        raise ValueError(f"{self.name} agent could not repair {arrayKey}[{item.index}]: {error}")
+
+    def output_path(self, file_name: str) -> str:
+        return f"{self.llmConfig.modelStore}/{file_name}-{self.name}.md"
+
+    def write_response(self, response: AgentResponse, file_name: str, responseSchema: Dict[str, Any] = None):
+        with open(self.output_path(file_name), 'w') as f:
+            f.write(response.content if responseSchema is None else json.dumps(response.content, indent=4))
+
+    def memory_context(self, prompt: str) -> str:
+        if not self.useMemory:
+            return ""
+        return self.memory.context(prompt, self.memoryContextTokens)
+
+    def system_prompt(self) -> str:
+        """Identical for every call of this agent, so Ollama can reuse its KV cache"""
+        return f"{self.base_prompt}\n\nRole: {self.role}"
+
+    def build_prompt(self, prompt: str, prefix: str = None, useMemory: bool = True) -> str:
+        """User prompt laid out as stable prefix, then memory, then the per call part"""
+        memory = self.memory_context(prompt) if useMemory else ""
+        parts = [prefix, f"Relevant memory:\n{memory}" if memory else None, prompt]
+        return "\n\n".join(part for part in parts if part)
+
+    def build_request(self, prompt: str, prefix: str = None, outputTokens: int = None, structured: bool = False) -> Dict[str, Any]:
+        """Keyword arguments for generate: system prompt, keep_alive and num_ctx/num_predict
+        sized to the prompt. The prefix leads the prompt, so identical prefixes hit
+        Ollama's prompt cache.
+
+        Structured requests get no num_predict, a JSON document cut at a guessed
+        budget is useless and the schema ends generation on its own, outputTokens
+        only sizes their num_ctx.
+
+        A prompt that would overflow the model's context first loses its memory
+        block, then is cut to fit, both with a warning.
+        """
+        request = {"system": self.system_prompt(), "keep_alive": ModelResidency.keep_alive(self.llmConfig)}
+        request["prompt"] = self.build_prompt(prompt, prefix)
+        outputTokens = self.output_budget(outputTokens)
+        promptTokens = self.request_tokens(request)
+        if not self.budget.fits(promptTokens, outputTokens) and self.memory_context(prompt):
+            logger.warning(f"{self.name} agent prompt of ~{promptTokens} tokens overflows the context, dropping memory.")
+            request["prompt"] = self.build_prompt(prompt, prefix, useMemory=False)
+            promptTokens = self.request_tokens(request)
+        limit = self.budget.prompt_limit()
+        if promptTokens > limit:
+            logger.warning(f"{self.name} agent prompt of ~{promptTokens} tokens exceeds the {self.budget.maxContext} token context, trimming to {limit}.")
+            request["prompt"] = truncate_to_tokens(request["prompt"], max(0, limit - (promptTokens - estimate_tokens(request["prompt"]))))
+            promptTokens = self.request_tokens(request)
+        numCtx, numPredict = self.budget.plan(promptTokens, outputTokens)
+        request["options"] = {"num_ctx": numCtx} if structured else {"num_ctx": numCtx, "num_predict": numPredict}
+        span = tracer.current_span()
+        if span is not None:
+            span.set(promptTokensEstimate=promptTokens, numCtx=numCtx, numPredict=None if structured else numPredict)
+        return request
+
+    def output_budget(self, outputTokens: int = None) -> int:
+        return outputTokens or self.llmConfig.openAIConfig.max_tokens or self.budget.defaultPredict
+
+    def request_tokens(self, request: Dict[str, Any]) -> int:
+        return estimate_tokens(request["system"]) + estimate_tokens(request["prompt"])
+
+    def get_options(self) -> Dict[str, Any]:
+        """Ollama generation options derived from the OpenAI config, num_ctx and num_predict are set per request"""
+        return {
+            "temperature": self.llmConfig.openAIConfig.temperature,  # Optional: creativity level
+        }
+
+    def get_client(self, base_url: str = None) -> PooledClient:
+        """Shared keep-alive client for a node (base_url by default), this agent's model and options"""
+        # Requests sent while the model is held carry the pin, so this node must be released with the others
+        ModelResidency.mark_pinned(self.llmConfig, base_url or self.llmConfig.base_url)
+        return ClientRegistry.get_client(
+            base_url or self.llmConfig.base_url,
+            self.llmConfig.model,
+            self.get_options(),
+            self.llmConfig.maxConnections
+        )
+
+    def call_llm(self, prompt: str, **kwargs):
+        """Non streaming generate dispatched through the endpoint pool"""
+        return self.pool.call(self.llmConfig.model, lambda url: self.get_client(url).generate(prompt, **kwargs))
+
+    async def acall_llm(self, prompt: str, **kwargs):
+        """Async variant of call_llm"""
+        return await self.pool.acall(self.llmConfig.model, lambda url: self.get_client(url).agenerate(prompt, **kwargs))
+
+    def cache_key(self, prompt: str, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> Optional[str]:
+        """Hash of everything that determines the response, None when caching is disabled"""
+        if self.cache is None:
+            return None
+        return ResponseCache.make_key(
+            model=self.llmConfig.model,
+            base_prompt=self.base_prompt,
+            role=self.role,
+            prefix=prefix,
+            prompt=prompt,
+            memory=self.memory_context(prompt),
+            responseSchema=responseSchema,
+            options=self.get_options(),
+            outputTokens=outputTokens
+        )
+
+    def cached_response(self, cacheKey: Optional[str], responseSchema: Dict[str, Any] = None) -> Optional[AgentResponse]:
+        if cacheKey is None:
+            return None
+        entry = self.cache.get(cacheKey)
+        if entry is None:
+            return None
+        logger.info(f"{self.name} agent using cached response {cacheKey[:12]}.")
+        stats = GenerationStats(outputChars=len(entry["content"]))
+        try:
+            response = self._text_response(entry["content"], stats) if responseSchema is None else self._structured_response(entry["content"], stats, responseSchema=responseSchema)
+        except ValueError as error:
+            logger.warning(f"{self.name} agent ignoring cached response {cacheKey[:12]}: {error}")
+            return None
+        response.metadata["cached"] = True
+        return response
+
+    def generate(self, prompt: str, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> AgentResponse:
+        try:
+            cacheKey = self.cache_key(prompt, prefix=prefix, outputTokens=outputTokens)
+            cached = self.cached_response(cacheKey)
+            if cached is not None:
+                return cached
+            start_time = time.time()
+            response = self.call_llm(**self.build_request(prompt, prefix, outputTokens))
+            return self._text_response(response.response, stats_from_response(response, start_time, output=response.response), cacheKey)
+
+        except TruncatedResponseError:
+            raise
+        except Exception as error:
+            logger.error(f"Error in {self.name} agent: {error}")
+            raise Exception(f"{self.name} agent failed to generate content")
+
+    async def agenerate(self, prompt: str, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> AgentResponse:
+        """Async variant of generate"""
+        try:
+            cacheKey = self.cache_key(prompt, prefix=prefix, outputTokens=outputTokens)
+            cached = self.cached_response(cacheKey)
+            if cached is not None:
+                return cached
+            start_time = time.time()
+            response = await self.acall_llm(**self.build_request(prompt, prefix, outputTokens))
+            return self._text_response(response.response, stats_from_response(response, start_time, output=response.response), cacheKey)
+
+        except TruncatedResponseError:
+            raise
         except Exception as error:
-            logger.error(f"Error in {self.name} agent:", error)
+            logger.error(f"Error in {self.name} agent: {error}")
             raise Exception(f"{self.name} agent failed to generate content")
 
-    def generate_structured(self, prompt: str, responseSchema: Dict[str, Any] = None) -> AgentResponse:
+    def generate_structured(self, prompt: str, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> AgentResponse:
         """Generate content with structured response"""
-        full_prompt = f"{self.base_prompt}\n\nRole: {self.role}\n\n{prompt}"
-        response = ollama_generate(
-                        model=self.llmConfig.model,
-                        prompt=full_prompt,
-                        format=responseSchema,
-                        stream=False,
-                        options={
-                            "max_tokens": 8000,  # Set the max tokens
-                            "temperature": self.llmConfig.openAIConfig.temperature,  # Optional: creativity level
-                        }
-                    )
-
-        self.memory.append(response.response)
-
-        response = AgentResponse(content=json.loads(response.response), metadata={"agent": self.name, "role": self.role, "json": True})
+        cacheKey = self.cache_key(prompt, responseSchema, prefix, outputTokens)
+        cached = self.cached_response(cacheKey, responseSchema)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        response = self.call_llm(format=responseSchema, stream=False, **self.build_request(prompt, prefix, outputTokens, structured=True))
+        return self._structured_response(response.response, stats_from_response(response, start_time, output=response.response), cacheKey, responseSchema)
+
+    async def agenerate_structured(self, prompt: str, responseSchema: Dict[str, Any] = None, prefix: str = None, outputTokens: int = None) -> AgentResponse:
+        """Async variant of generate_structured"""
+        cacheKey = self.cache_key(prompt, responseSchema, prefix, outputTokens)
+        cached = self.cached_response(cacheKey, responseSchema)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        response = await self.acall_llm(format=responseSchema, stream=False, **self.build_request(prompt, prefix, outputTokens, structured=True))
+        return self._structured_response(response.response, stats_from_response(response, start_time, output=response.response), cacheKey, responseSchema)
+
+    def check_complete(self, stats: GenerationStats):
+        """Raise TruncatedResponseError when the model was cut off instead of finishing"""
+        if stats.doneReason == "length":
+            raise TruncatedResponseError(f"{self.name} agent response stopped at its token limit after {stats.evalCount} tokens")
+
+    def _text_response(self, content: str, stats: GenerationStats, cacheKey: str = None) -> AgentResponse:
+        self.check_complete(stats)
+        self.memory.append(content)
+        if cacheKey is not None:
+            self.cache.put(cacheKey, content, agent=self.name, model=self.llmConfig.model)
+        return AgentResponse(content=content, metadata={"agent": self.name, "role": self.role, "json": False, "stats": asdict(stats)})
+
+    def _structured_response(self, content: str, stats: GenerationStats, cacheKey: str = None, responseSchema: Dict[str, Any] = None) -> AgentResponse:
+        self.check_complete(stats)
+        self.memory.append(content)
+        response = AgentResponse(content=parse_structured(content, responseSchema), metadata={"agent": self.name, "role": self.role, "json": True, "stats": asdict(stats)})
+        # Only cache after the JSON parsed, a malformed response should be regenerated
+        if cacheKey is not None:
+            self.cache.put(cacheKey, content, agent=self.name, model=self.llmConfig.model)
         return response
 
     def update_safety_config(self, **kwargs):
@@ -0,0 +1,115 @@
+import re
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterator, List, Optional
+from ai.agents.Tokens import estimate_tokens, truncate_to_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9']{4,}")
+
+
+@dataclass
+class MemoryEntry:
+    text: str
+    tokens: int
+    createdAt: float = field(default_factory=time.time)
+
+
+def leading_sentences_summary(summary: str, evicted: List[str], maxTokens: int) -> str:
+    """Default compaction, keeps the first sentence of each evicted entry"""
+    sentences = [summary] if summary else []
+    for text in evicted:
+        first = re.split(r"(?<=[.!?])\s+", text.strip(), maxsplit=1)[0]
+        if first:
+            sentences.append(first)
+    # Keep the most recent part of the summary when it outgrows its budget
+    combined = " ".join(sentences)
+    while estimate_tokens(combined) > maxTokens and len(sentences) > 1:
+        sentences.pop(0)
+        combined = " ".join(sentences)
+    return truncate_to_tokens(combined, maxTokens)
+
+
+class AgentMemory:
+    """Token bounded ring buffer of an agent's past outputs with a rolling summary.
+
+    Entries are evicted oldest first once the buffer exceeds maxTokens or
+    maxEntries. Evicted entries are folded into `summary` by `summarizer`
+    (leading sentences by default, or an LLM backed callable) so the gist of
+    older turns survives while memory use stays flat.
+    """
+    def __init__(self, maxTokens: int = 4000, maxEntries: int = 32, summaryMaxTokens: int = 500,
+                 summarizer: Optional[Callable[[str, List[str], int], str]] = leading_sentences_summary):
+        self.maxTokens = maxTokens
+        self.maxEntries = maxEntries
+        self.summaryMaxTokens = summaryMaxTokens
+        self.summarizer = summarizer
+        self.entries: Deque[MemoryEntry] = deque()
+        self.summary: str = ""
+        self.tokens: int = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return (entry.text for entry in self.entries)
+
+    def __getitem__(self, index: int) -> str:
+        return self.entries[index].text
+
+    def append(self, text: str):
+        # A single entry never takes more than the whole budget
+        text = truncate_to_tokens(text, self.maxTokens)
+        entry = MemoryEntry(text=text, tokens=estimate_tokens(text))
+        self.entries.append(entry)
+        self.tokens += entry.tokens
+        self._evict()
+
+    def _evict(self):
+        evicted = []
+        while self.entries and (self.tokens > self.maxTokens or len(self.entries) > self.maxEntries):
+            entry = self.entries.popleft()
+            self.tokens -= entry.tokens
+            evicted.append(entry.text)
+        if evicted and self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, evicted, self.summaryMaxTokens)
+
+    def clear(self):
+        self.entries.clear()
+        self.summary = ""
+        self.tokens = 0
+
+    def context(self, query: str = None, maxTokens: int = 1000) -> str:
+        """Memory to inject into a prompt: the rolling summary plus the entries most
+        relevant to query (word overlap), or the most recent ones, within maxTokens"""
+        if not self.entries and not self.summary:
+            return ""
+        parts = []
+        budget = maxTokens
+        if self.summary:
+            summary = truncate_to_tokens(self.summary, budget)
+            parts.append(f"Summary of earlier work: {summary}")
+            budget -= estimate_tokens(summary)
+
+        candidates = list(enumerate(self.entries))
+        if query:
+            queryWords = set(WORD_PATTERN.findall(query.lower()))
+            candidates.sort(key=lambda item: (len(queryWords & set(WORD_PATTERN.findall(item[1].text.lower()))), item[0]), reverse=True)
+        else:
+            candidates.reverse()
+
+        selected = []
+        for index, entry in candidates:
+            if budget <= 0:
+                break
+            text = truncate_to_tokens(entry.text, budget)
+            selected.append((index, text))
+            budget -= estimate_tokens(text)
+        # Present selected entries in the order they were produced
+        parts.extend(text for _, text in sorted(selected))
+        return "\n\n".join(parts)
@@ -0,0 +1,85 @@
+import re
+import shlex
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+from ai.operators.executer import ALLOWED_COMMANDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROUTE_DIRECT = "direct"
+ROUTE_TEMPLATE = "template"
+ROUTE_CACHE = "cache"
+
+# Natural language forms of the allowed commands, (pattern, command, args template)
+TEMPLATES: List[Tuple[Pattern, str, str]] = [
+    (re.compile(r"^(?:who am i|what(?:'s| is) my (?:user ?name|user|login))$", re.I), "whoami", ""),
+    (re.compile(r"^(?:where am i|(?:show |print )?(?:the )?(?:current|working|present working) directory)$", re.I), "pwd", ""),
+    (re.compile(r"^(?:list|show)(?: all)? (?:the )?files(?: in (?P<path>\S+))?$", re.I), "ls", "-la {path}"),
+    (re.compile(r"^(?:show |check )?(?:free )?disk (?:space|free)(?: on (?P<path>\S+))?$", re.I), "df", "-h {path}"),
+    (re.compile(r"^(?:show |check )?disk usage(?: (?:of|in|for) (?P<path>\S+))?$", re.I), "du", "-sh {path}"),
+]
+
+
+def collapse(prompt: str) -> str:
+    return " ".join(prompt.strip().rstrip("?.!").split())
+
+
+def normalize(prompt: str) -> str:
+    return collapse(prompt).lower()
+
+
+def shell_action(command: str, args: List[str]) -> Dict[str, Any]:
+    return {"action": "run_shell_command", "command": command, "command_args": shlex.join(args)}
+
+
+class CommandRouter:
+    """Resolves user input to a run_shell_command action without calling the LLM when it can.
+
+    Input that already starts with an allowed command, or matches one of the
+    natural language TEMPLATES, is parsed directly. Actions the LLM derived are
+    remembered per normalized prompt, so a repeated request skips the LLM too.
+    """
+    def __init__(self, maxCached: int = 256):
+        self.maxCached = maxCached
+        self._intents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def route(self, prompt: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(action, how it was routed) or None when the LLM has to interpret the prompt"""
+        try:
+            tokens = shlex.split(prompt.strip())
+        except ValueError:
+            tokens = []
+        if tokens and tokens[0] in ALLOWED_COMMANDS:
+            return shell_action(tokens[0], tokens[1:]), ROUTE_DIRECT
+
+        text = collapse(prompt)
+        for pattern, command, argsTemplate in TEMPLATES:
+            match = pattern.match(text)
+            if match:
+                args = argsTemplate.format(path=match.groupdict().get("path") or "").split()
+                return shell_action(command, args), ROUTE_TEMPLATE
+
+        with self._lock:
+            key = normalize(prompt)
+            action = self._intents.get(key)
+            if action is not None:
+                self._intents.move_to_end(key)
+                return dict(action), ROUTE_CACHE
+        return None
+
+    def remember(self, prompt: str, action: Dict[str, Any]):
+        """Cache an LLM derived action or plan for the prompt, only allowed commands are kept"""
+        steps = action.get("steps") if isinstance(action.get("steps"), list) else [action]
+        if not steps or any(step.get("action") != "run_shell_command" or step.get("command") not in ALLOWED_COMMANDS for step in steps):
+            return
+        key = normalize(prompt)
+        with self._lock:
+            self._intents[key] = dict(action)
+            self._intents.move_to_end(key)
+            while len(self._intents) > self.maxCached:
+                self._intents.popitem(last=False)
@@ -0,0 +1,188 @@
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import json_repair
+from jsonschema import Draft7Validator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class StreamItem:
+    index: int
+    raw: str
+    value: Any = None
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+
+def item_schema(responseSchema: Dict[str, Any], arrayKey: str) -> Optional[Dict[str, Any]]:
+    """Schema of the elements of responseSchema's top level arrayKey array"""
+    return ((responseSchema or {}).get("properties", {}).get(arrayKey) or {}).get("items")
+
+
+def schema_error(value: Any, schema: Optional[Dict[str, Any]]) -> Optional[str]:
+    """First validation error of value against schema, None when it conforms"""
+    return validation_error(Draft7Validator(schema), value) if schema else None
+
+
+def validation_error(validator: Draft7Validator, value: Any) -> Optional[str]:
+    error = next(validator.iter_errors(value), None)
+    if error is None:
+        return None
+    path = "/".join(str(part) for part in error.absolute_path)
+    return f"{path}: {error.message}" if path else error.message
+
+
+def parse_structured(content: str, responseSchema: Dict[str, Any] = None, repair: bool = True) -> Any:
+    """json.loads, falling back to json_repair for slightly malformed output.
+
+    The document must match responseSchema, otherwise ValueError is raised as
+    json.loads would have. repair=False refuses the json_repair fallback, for
+    output known to be cut off, where closing the document would hide what
+    is missing.
+    """
+    try:
+        document = json.loads(content)
+    except ValueError as error:
+        if not repair:
+            raise
+        repaired = json_repair.loads(content)
+        if repaired in ("", None) or schema_error(repaired, responseSchema):
+            raise error
+        logger.warning(f"Repaired malformed JSON response ({error})")
+        return repaired
+    error = schema_error(document, responseSchema)
+    if error is not None:
+        raise ValueError(f"Response does not match its schema: {error}")
+    return document
+
+
+class JsonItemStream:
+    """Incremental scanner yielding the elements of one top level array of a streamed JSON object.
+
+    feed() takes the text as it streams in and returns the elements of
+    `arrayKey` that closed in it, parsed and checked against `itemSchema`, so
+    a consumer can start on the first element while the rest is generated.
+    Elements that do not parse or validate come back with `error` set, for
+    the caller to repair on their own instead of regenerating the document.
+    """
+    def __init__(self, arrayKey: str, itemSchema: Dict[str, Any] = None):
+        self.arrayKey = arrayKey
+        self.itemSchema = itemSchema
+        self.validator = Draft7Validator(itemSchema) if itemSchema else None
+        self.text = ""
+        self.items: List[StreamItem] = []
+        self._pos = 0
+        self._stack: List[str] = []
+        self._inString = False
+        self._escape = False
+        self._stringStart = 0
+        self._lastKey: Optional[str] = None
+        self._currentKey: Optional[str] = None
+        # Nesting depth of the elements of the array while inside it, 0 otherwise
+        self._arrayDepth = 0
+        self._itemStart: Optional[int] = None
+
+    @property
+    def closed(self) -> bool:
+        """True once the array has ended"""
+        return self._arrayDepth < 0
+
+    def feed(self, text: str) -> List[StreamItem]:
+        self.text += text
+        completed = []
+        while self._pos < len(self.text):
+            item = self._scan(self.text[self._pos], self._pos)
+            if item is not None:
+                completed.append(item)
+            self._pos += 1
+        return completed
+
+    def finish(self) -> List[StreamItem]:
+        """Elements left open when the stream ended, reported as incomplete"""
+        if self._arrayDepth > 0 and self._itemStart is not None:
+            raw = self.text[self._itemStart:].strip()
+            self._itemStart = None
+            if self._stack and len(self._stack) == self._arrayDepth and raw and raw[0] not in '{["':
+                return [self._complete(raw.rstrip(",]} \t\r\n"))]
+            item = StreamItem(index=len(self.items), raw=raw, error="incomplete element, the response ended inside it")
+            self.items.append(item)
+            return [item]
+        return []
+
+    def values(self) -> List[Any]:
+        return [item.value for item in self.items]
+
+    def _scan(self, char: str, pos: int) -> Optional[StreamItem]:
+        depth = len(self._stack)
+        if self._inString:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._inString = False
+                if depth == 1 and self._arrayDepth == 0:
+                    self._lastKey = self._string(self._stringStart, pos)
+                elif self._arrayDepth > 0 and depth == self._arrayDepth and self._itemStart == self._stringStart:
+                    return self._complete(self.text[self._itemStart:pos + 1])
+            return None
+
+        if self._arrayDepth > 0 and depth == self._arrayDepth and self._itemStart is None and char not in WHITESPACE + ",]":
+            self._itemStart = pos
+
+        if char == '"':
+            self._inString = True
+            self._stringStart = pos
+        elif char in "{[":
+            self._stack.append(char)
+            if char == "[" and depth == 1 and self._arrayDepth == 0 and self._currentKey == self.arrayKey:
+                self._arrayDepth = len(self._stack)
+        elif char in "}]":
+            if self._arrayDepth > 0 and depth == self._arrayDepth and self._itemStart is not None:
+                # A number, true, false or null element ends at the closing bracket
+                item = self._complete(self.text[self._itemStart:pos].strip())
+                self._stack.pop()
+                self._arrayDepth = -1
+                return item
+            if self._stack:
+                self._stack.pop()
+            if self._arrayDepth > 0 and len(self._stack) == self._arrayDepth - 1:
+                self._arrayDepth = -1
+            elif self._arrayDepth > 0 and len(self._stack) == self._arrayDepth and self._itemStart is not None:
+                return self._complete(self.text[self._itemStart:pos + 1])
+        elif char == ":" and depth == 1:
+            self._currentKey = self._lastKey
+        elif char == ",":
+            if depth == 1:
+                self._currentKey = None
+            elif self._arrayDepth > 0 and depth == self._arrayDepth and self._itemStart is not None:
+                return self._complete(self.text[self._itemStart:pos].strip())
+        return None
+
+    def _string(self, start: int, end: int) -> Optional[str]:
+        try:
+            return json.loads(self.text[start:end + 1])
+        except ValueError:
+            return None
+
+    def _complete(self, raw: str) -> StreamItem:
+        self._itemStart = None
+        item = StreamItem(index=len(self.items), raw=raw)
+        try:
+            item.value = json.loads(raw)
+        except ValueError as error:
+            item.error = f"invalid JSON: {error}"
+        else:
+            item.error = validation_error(self.validator, item.value) if self.validator is not None else None
+        self.items.append(item)
+        return item
@@ -0,0 +1,26 @@
+import asyncio
+from typing import Dict, Optional
+from ai.agents.RunManifest import RunManifest
+from ai.models.LLMConfig import LLMConfig
+
+
+class NovelRun:
+    """State of one generateNovel call, handed to every stage of it.
+
+    Kept off the NovelWriter so concurrent runs on one writer each keep their
+    own manifest and request slots. Stages called on their own (run=None) get
+    a throwaway run without a manifest.
+    """
+    def __init__(self, manifest: Optional[RunManifest] = None, maxConcurrent: int = 1):
+        self.manifest = manifest
+        self.maxConcurrent = max(1, maxConcurrent)
+        # Created inside the run, semaphores belong to the event loop they are first used on
+        self.requestSlots: Dict[tuple, asyncio.Semaphore] = {}
+
+    def request_slots(self, llmConfig: LLMConfig) -> asyncio.Semaphore:
+        """Shared by every stage sending to the same nodes, so pipelining stages does not
+        put more than maxConcurrent requests in flight on a node"""
+        key = tuple(llmConfig.endpoints())
+        if key not in self.requestSlots:
+            self.requestSlots[key] = asyncio.Semaphore(self.maxConcurrent)
+        return self.requestSlots[key]
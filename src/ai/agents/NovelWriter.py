@@ -1,42 +1,120 @@
+import os
+import re
+import math
+import asyncio
 import logging
 from ai.agents.Agent import Agent
+from ai.backend.ModelResidency import ModelResidency
+from ai.agents.Tokens import words_to_tokens
+from ai.agents.AgentMemory import leading_sentences_summary
+from ai.tracing.Tracer import tracer, KIND_NOVEL, KIND_CHAPTER, KIND_STAGE
+from ai.agents.RunManifest import RunManifest, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+from ai.agents.NovelRun import NovelRun
 from ai.models.novel.Schema import NovelSpec, ChapterSpec, AgentResponse, Character
 from ai.models.LLMConfig import LLMConfig
-from typing import List
+from typing import Callable, List, Dict, Any
 import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Output token budgets per stage, they size num_ctx of each request and num_predict of the text stages.
+# Generous on purpose: a response that still hits its limit is retried once with twice the budget, then fails
+OUTLINE_TOKENS_PER_CHAPTER = 600
+PROFILE_TOKENS_PER_CHARACTER = 1000
+CHAPTER_PLOT_TOKENS = 2048
+# Rolling summary of earlier pages and verbatim tail carried into each chunk of a chunked chapter
+CHUNK_SUMMARY_TOKENS = 400
+CHUNK_TAIL_CHARS = 600
+
 class NovelWriter:
-    def __init__(self, llmConfig: LLMConfig):
+    def __init__(self, llmConfig: LLMConfig, streamOutput: bool = True, maxConcurrentChapters: int = None,
+                 chunkPages: int = None, stageConfigs: Dict[str, LLMConfig] = None, queueSize: int = 2,
+                 preloadModels: bool = True, onToken: Callable[[str, str], None] = None, speculativePlots: bool = True,
+                 onDiscard: Callable[[str], None] = None):
+        # Stream chapter stages so partial output lands on disk while the model is still generating
+        self.streamOutput = streamOutput
+        # Called with (stage, token) for every streamed token, e.g. to show progress in a UI
+        self.onToken = onToken
+        # Called with stage when the tokens streamed for it so far are void, it stopped at its token limit and streams again
+        self.onDiscard = onDiscard
+        # Requests in flight per Ollama node across all stages, match it to the server's OLLAMA_NUM_PARALLEL.
+        # Read from this process' environment, the server's own setting is not visible to the client
+        if maxConcurrentChapters is None:
+            maxConcurrentChapters = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+        self.maxConcurrentChapters = max(1, maxConcurrentChapters)
+        # Write and edit chapters chunkPages pages per request instead of in one call, None disables
+        self.chunkPages = chunkPages
+        # Chapters waiting between pipeline stages, bounds how far plotting runs ahead of editing
+        self.queueSize = max(1, queueSize)
+        # Start each chapter plot as soon as its outline entry has streamed in, with profiles alongside the plots.
+        # Needs a second request slot per node for the plots, see use_speculative_plots()
+        self.speculativePlots = speculativePlots
+        self.llmConfig = llmConfig
+        # Per agent overrides, e.g. {"editor": LLMConfig(...)} to edit on another model or node
+        stageConfigs = stageConfigs or {}
         self.agents = {
             "plotter": Agent(
                 name="Plotter",
                 role="plot_planner",
                 base_prompt="You are a creative plot developer in dialogue-driven storytelling. Create engaging and coherent plot points.",
-                llmConfig=llmConfig
+                llmConfig=stageConfigs.get("plotter", llmConfig)
             ),
             "character_developer": Agent(
                 name="Character Developer",
                 role="character_developer",
                 base_prompt="You are a character developer. Create deep, complex characters with clear motivations.",
-                llmConfig=llmConfig
+                llmConfig=stageConfigs.get("character_developer", llmConfig)
             ),
             "writer": Agent(
                 name="Writer",
                 role="chapter_writer",
                 base_prompt="You are a creative writer with dialogue-driven storytelling.",
-                llmConfig=llmConfig
+                llmConfig=stageConfigs.get("writer", llmConfig)
             ),
             "editor": Agent(
                 name="Editor",
                 role="editor",
                 base_prompt="You are an editor. Review and improve the content while maintaining consistency.",
-                llmConfig=llmConfig
+                llmConfig=stageConfigs.get("editor", llmConfig)
             )
         }
+        # Load and pin every model the agents use now instead of inside the first stage, see close()
+        self.residentConfigs: List[LLMConfig] = []
+        if preloadModels:
+            self.residentConfigs = self.distinct_configs()
+            for config in self.residentConfigs:
+                ModelResidency.acquire(config)
+
+    def distinct_configs(self) -> List[LLMConfig]:
+        configs = {}
+        for agent in self.agents.values():
+            configs.setdefault(ModelResidency.key(agent.llmConfig), agent.llmConfig)
+        return list(configs.values())
+
+    def close(self, releaseKeepAlive=None):
+        """Unpin the preloaded models, they stay loaded for their configured keepAlive so the
+        next run skips the load. releaseKeepAlive=0 unloads them unless someone else holds them"""
+        for config in self.residentConfigs:
+            ModelResidency.release(config, releaseKeepAlive)
+        self.residentConfigs = []
+
+    def use_speculative_plots(self) -> bool:
+        """speculativePlots unless it cannot help: with one request slot the streaming outline holds
+        it until it completes, and stages swapping models on a shared node are run stage by stage"""
+        if not self.speculativePlots:
+            return False
+        if self.maxConcurrentChapters == 1:
+            logger.info("One request per node (set OLLAMA_NUM_PARALLEL for this process to the server's value), plotting chapters after the outline")
+            return False
+        return not self.group_by_model(("plotter", "character_developer", "writer", "editor"))
+
+    def group_by_model(self, agentKeys=("plotter", "writer", "editor")) -> bool:
+        """True when chapter stages use different models on a shared node, where
+        pipelining them would swap models in and out for every chapter"""
+        configs = [self.agents[key].llmConfig for key in agentKeys]
+        return any(a.model != b.model and set(a.endpoints()) & set(b.endpoints()) for a in configs for b in configs)
     
     async def format_character_details(self, characters):
             """Format character details into a structured string"""
@@ -95,8 +173,8 @@ class NovelWriter:
             return "\n\n---\n\n".join(formatted_characters)
     
 
-    async def createNovelOutline(self, spec: NovelSpec) -> AgentResponse:
-        """Create a detailed plot outline for the novel"""
+    async def createNovelOutline(self, spec: NovelSpec, onChapter: Callable[[int, Dict[str, Any]], None] = None, run: NovelRun = None) -> AgentResponse:
+        """Create a detailed plot outline for the novel, passing each chapter entry to onChapter as soon as it is complete"""
         keyEvents = ''
         if spec.keyEvents is not None:
             keyEvents = '\n               - '.join(spec.keyEvents)
@@ -143,9 +221,12 @@ class NovelWriter:
             },
             "required": ["chapters"]
         }
-        return self.agents["plotter"].timed_generate(prompt, "novel_outline", responseSchema)
+        # An outline that closed short is completed with requests for only its missing chapters
+        return await self.runStage("novel_outline", "plotter", prompt, "novel_outline", responseSchema,
+                                   outputTokens=OUTLINE_TOKENS_PER_CHAPTER * spec.totalChapters, itemsKey="chapters", onItem=onChapter,
+                                   minItems=spec.totalChapters, run=run)
 
-    async def createCharacterProfiles(self, spec: NovelSpec, plotOutline: AgentResponse) -> AgentResponse:
+    async def createCharacterProfiles(self, spec: NovelSpec, plotOutline: AgentResponse, run: NovelRun = None) -> AgentResponse:
         """Create a detailed plot outline for the novel"""
         prompt = f"""
             Create character profiles for the novel "${spec.title}".
@@ -158,82 +239,383 @@ class NovelWriter:
             - Describe character clothing, appearance erotically and more feminine way
             - Plan character development across ${spec.totalChapters} chapters
         """
-        return self.agents["character_developer"].timed_generate(prompt, "novel_outline")
+        return await self.runStage("character_profiles", "character_developer", prompt, "novel_outline",
+                                   outputTokens=PROFILE_TOKENS_PER_CHARACTER * max(1, len(spec.characters or [])), run=run)
+
+    async def runStage(self, stage: str, agentKey: str, prompt: str, file_name: str, responseSchema: Dict[str, Any] = None,
+                       prefix: str = None, outputTokens: int = None, itemsKey: str = None,
+                       onItem: Callable[[int, Any], None] = None, minItems: int = None, run: NovelRun = None) -> AgentResponse:
+        """Run one agent stage, skipping it when the manifest of run already has its output.
+
+        With itemsKey, each element of that array of the structured response is
+        passed to onItem(index, element) as soon as it is generated and valid,
+        and a streamed array shorter than minItems is completed element by element.
+        """
+        agent: Agent = self.agents[agentKey]
+        run = run or NovelRun(maxConcurrent=self.maxConcurrentChapters)
+        manifest = run.manifest
+        # Span names drop the chapter number so metrics aggregate per stage type
+        with tracer.span(re.sub(r"(_\d+)+$", "", stage), KIND_STAGE, stage=stage, agent=agent.name, model=agent.llmConfig.model) as span:
+            if manifest is not None:
+                resumed = manifest.load_output(stage)
+                if resumed is not None:
+                    logger.info(f"Skipping stage {stage}, loaded from {manifest.stages[stage]['output']}")
+                    span.set(resumed=True)
+                    self.emit_items(resumed, itemsKey, onItem)
+                    return resumed
+                manifest.mark(stage, STATUS_RUNNING, agent=agent.name)
+            try:
+                onToken = None if self.onToken is None else lambda token: self.onToken(stage, token)
+                onRetry = None if self.onDiscard is None else lambda: self.onDiscard(stage)
+                async with run.request_slots(agent.llmConfig):
+                    if itemsKey is not None and self.streamOutput:
+                        response = await agent.atimed_generate_items(prompt, file_name, responseSchema, itemsKey, onItem, prefix=prefix,
+                                                                     outputTokens=outputTokens, onToken=onToken, onRetry=onRetry,
+                                                                     minItems=minItems)
+                    else:
+                        response = await agent.atimed_generate(prompt, file_name, responseSchema, stream=self.streamOutput, prefix=prefix,
+                                                               outputTokens=outputTokens, onToken=onToken, onRetry=onRetry)
+                        self.emit_items(response, itemsKey, onItem)
+            except Exception as e:
+                if manifest is not None:
+                    manifest.mark(stage, STATUS_FAILED, error=str(e))
+                raise
+            if manifest is not None:
+                manifest.mark(stage, STATUS_DONE, output=agent.output_path(file_name), json=responseSchema is not None)
+            return response
+
+    def emit_items(self, response: AgentResponse, itemsKey: str, onItem: Callable[[int, Any], None]):
+        if itemsKey is not None and onItem is not None and isinstance(response.content, dict):
+            for index, item in enumerate(response.content.get(itemsKey) or []):
+                onItem(index, item)
+
+    async def generateNovel(self, novelSpec: NovelSpec, resume: bool = False) -> str:
+        """Generate a novel using all agents in sequence
 
-    async def generateNovel(self, novelSpec: NovelSpec) -> str:
-        """Generate a novel using all agents in sequence"""
+        Progress is checkpointed to run-manifest.json in the model store after every
+        stage. With resume=True, stages finished by a previous run of the same spec
+        are loaded from disk and generation restarts at the first incomplete stage.
+        """
         print("Generating novel...")
         chapterContent = []
-        try:
-            # Generate plot points
-            plotOutline: AgentResponse = await self.createNovelOutline(novelSpec)
-            characterProfiles: AgentResponse = await self.createCharacterProfiles(novelSpec, plotOutline)
-
-            context = {
-                "description": novelSpec.description,
-                "keyEvents": novelSpec.keyEvents,
-                "plot": novelSpec.keyEvents,
-                "chapters": plotOutline.content['chapters'],
-                "characters": characterProfiles.content
-            }
-            chapterCount = 0
-            print (f"Generating {len(context['chapters'])} chapters...")
-            while chapterCount < novelSpec.totalChapters and chapterCount < len(context['chapters']):
-                chapterSpec = ChapterSpec(
-                    chapterNumber=chapterCount + 1,
-                    pagesPerChapter=novelSpec.pagesPerChapter,
-                    wordsPerPage=novelSpec.wordsPerPage,
-                    title=f"Chapter {chapterCount + 1}",
-                    description=f"Part {chapterCount + 1} of {novelSpec.totalChapters}"
-                )
-                chapter: AgentResponse = self.generateChapter(chapterSpec, novelSpec, context)
-                chapterCount += 1
-                chapterContent.append(chapter.content)
-
-        except Exception as e:
-            logger.error(f"Error generating chapter loop: {str(e)}")
+        manifest = RunManifest.open(os.path.join(self.llmConfig.modelStore, "run-manifest.json"), novelSpec, resume)
+        # Every stage builds on the outline, with speculativePlots some finish before it does
+        manifest.require("novel_outline")
+        run = NovelRun(manifest, self.maxConcurrentChapters)
+        with tracer.span("novel", KIND_NOVEL, title=novelSpec.title, model=self.llmConfig.model, chapters=novelSpec.totalChapters) as span:
+            try:
+                if self.use_speculative_plots():
+                    chapters = await self.generateChaptersSpeculative(novelSpec, run)
+                else:
+                    # Generate plot points
+                    plotOutline: AgentResponse = await self.createNovelOutline(novelSpec, run=run)
+                    characterProfiles: AgentResponse = await self.createCharacterProfiles(novelSpec, plotOutline, run)
+
+                    context = self.build_context(novelSpec, plotOutline, characterProfiles)
+                    print (f"Generating {len(context['chapters'])} chapters...")
+                    chapterSpecs = self.build_chapter_specs(novelSpec, context)
+                    chapters = await self.generateChapters(chapterSpecs, novelSpec, context, run)
+                chapterContent = [chapter.content if isinstance(chapter, AgentResponse) else chapter for chapter in chapters]
+
+            except Exception as e:
+                logger.error(f"Error generating chapter loop: {str(e)}")
+                span.status = "error"
+                span.error = str(e)
         
-        return chapterContent
+            return chapterContent
         
-    def generateChapter(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, context) -> AgentResponse:
-        """Generate a chapter using all agents in sequence"""
-        logger.debug(f"=====================================================================")
-        logger.info(f"Generating chapter {chapterSpec.chapterNumber}...")
-        try:
-            # Generate plot points
-            chapterPlot: AgentResponse = self.agents["plotter"].timed_generate(
-                self.create_chapter_plot_prompt(chapterSpec=chapterSpec, novelSpec=novelSpec, context=context),
-                f"chapter_plot_{chapterSpec.chapterNumber}",
-            )
+    def build_context(self, novelSpec: NovelSpec, plotOutline: AgentResponse, characterProfiles: AgentResponse) -> dict:
+        return {
+            "description": novelSpec.description,
+            "keyEvents": novelSpec.keyEvents,
+            "plot": novelSpec.keyEvents,
+            "chapters": plotOutline.content['chapters'],
+            "characters": characterProfiles.content
+        }
+
+    def build_chapter_context(self, chapterPlot: AgentResponse, context: dict) -> dict:
+        return { "plot": chapterPlot.content, "characters": context["characters"], "description": context["description"], "keyEvents": context["keyEvents"] }
+
+    def build_chapter_specs(self, novelSpec: NovelSpec, context: dict) -> List[ChapterSpec]:
+        chapterTotal = min(novelSpec.totalChapters, len(context['chapters']))
+        return [self.build_chapter_spec(novelSpec, chapterNumber) for chapterNumber in range(1, chapterTotal + 1)]
+
+    def build_chapter_spec(self, novelSpec: NovelSpec, chapterNumber: int) -> ChapterSpec:
+        return ChapterSpec(
+            chapterNumber=chapterNumber,
+            pagesPerChapter=novelSpec.pagesPerChapter,
+            wordsPerPage=novelSpec.wordsPerPage,
+            title=f"Chapter {chapterNumber}",
+            description=f"Part {chapterNumber} of {novelSpec.totalChapters}"
+        )
+
+    async def generateChaptersSpeculative(self, novelSpec: NovelSpec, run: NovelRun = None) -> List[AgentResponse]:
+        """Outline, profiles and chapters as one dataflow, returned in chapter order.
 
-            chatperContext = { "plot": chapterPlot.content, "characters": context["characters"], "description": context["description"], "keyEvents": context["keyEvents"] }
+        A chapter plot only needs its own outline entry, so each one is queued
+        the moment that entry has streamed in instead of after the whole
+        outline. Character profiles are generated once the outline is complete,
+        alongside the plots, and only drafting waits for them.
+        """
+        total = novelSpec.totalChapters
+        # Outline entries by chapter index, create_chapter_plot_prompt reads context['chapters'][n]
+        entries: List[Any] = [None] * total
+        context = {
+            "description": novelSpec.description,
+            "keyEvents": novelSpec.keyEvents,
+            "plot": novelSpec.keyEvents,
+            "chapters": entries,
+            "characters": None
+        }
+        results: List[Any] = [None] * total
+        plots, drafts, edits = asyncio.Queue(), asyncio.Queue(self.queueSize), asyncio.Queue(self.queueSize)
+
+        def onChapter(index: int, entry: Dict[str, Any]):
+            if index >= total:
+                return
+            if entries[index] is None:
+                plots.put_nowait((index, self.build_chapter_spec(novelSpec, index + 1), None, None))
+            # An outline retried after its token limit hands its entries out again, plots not started yet use the new one
+            entries[index] = entry
+
+        async def outline() -> AgentResponse:
+            try:
+                plotOutline: AgentResponse = await self.createNovelOutline(novelSpec, onChapter, run)
+                # Entries the stream did not hand out one by one, e.g. a response that only parsed as a whole
+                for index, entry in enumerate(plotOutline.content['chapters']):
+                    onChapter(index, entry)
+                print (f"Generating {min(total, len(plotOutline.content['chapters']))} chapters...")
+                return plotOutline
+            finally:
+                plots.put_nowait(None)
+
+        async def profiles() -> AgentResponse:
+            characterProfiles: AgentResponse = await self.createCharacterProfiles(novelSpec, await outlineTask, run)
+            context["characters"] = characterProfiles.content
+            return characterProfiles
+
+        async def plot(chapterSpec: ChapterSpec, _) -> AgentResponse:
+            return await self.createChapterPlot(chapterSpec, novelSpec, context, run)
+
+        async def draft(chapterSpec: ChapterSpec, chapterPlot: AgentResponse) -> AgentResponse:
+            await profilesTask
+            return await self.writeChapter(chapterSpec, novelSpec, self.build_chapter_context(chapterPlot, context), run)
+
+        async def edit(chapterSpec: ChapterSpec, initialDraft: AgentResponse) -> AgentResponse:
+            return await self.editChapter(chapterSpec, initialDraft, run)
+
+        logger.info(f"Generating up to {total} chapters, plotting each as soon as its outline entry is ready...")
+        outlineTask = asyncio.ensure_future(outline())
+        profilesTask = asyncio.ensure_future(profiles())
+        outcomes = await asyncio.gather(
+            outlineTask,
+            profilesTask,
+            self.pipelineStage(plots, drafts, plot, results),
+            self.pipelineStage(drafts, edits, draft, results),
+            self.pipelineStage(edits, None, edit, results),
+            return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return results[:min(total, len(outcomes[0].content['chapters']))]
+
+    async def generateChapters(self, chapterSpecs: List[ChapterSpec], novelSpec: NovelSpec, context, run: NovelRun = None) -> List[AgentResponse]:
+        """Run chapters through a plot -> draft -> edit pipeline, returned in chapter order.
 
-            # # Develop characters
-            # chapterCharacters: AgentResponse = self.agents["character_developer"].timed_generate(
-            #     self.create_chapter_character_prompt(chapterSpec=chapterSpec, chapterPlot=chapterPlot, novelSpec=novelSpec, context=context),
-            #     f"chapter_char_{chapterSpec.chapterNumber}"
-            # )
-            # chatperContext["characters"] = chapterCharacters.content
+        Each stage has maxConcurrentChapters workers and hands chapters to the next
+        over a bounded queue, so editing chapter N overlaps drafting chapter N+1
+        (on another model or node when stageConfigs says so) and throughput is set
+        by the slowest stage instead of the sum of all three. Requests still share
+        the per node limit of the run's request slots.
+        """
+        logger.info(f"Generating {len(chapterSpecs)} chapters, {self.maxConcurrentChapters} requests per node at a time...")
+        results: List[Any] = [None] * len(chapterSpecs)
+        plots, drafts, edits = asyncio.Queue(), asyncio.Queue(self.queueSize), asyncio.Queue(self.queueSize)
+        for index, chapterSpec in enumerate(chapterSpecs):
+            plots.put_nowait((index, chapterSpec, None, None))
+        plots.put_nowait(None)
+
+        async def plot(chapterSpec: ChapterSpec, _) -> AgentResponse:
+            return await self.createChapterPlot(chapterSpec, novelSpec, context, run)
+
+        async def draft(chapterSpec: ChapterSpec, chapterPlot: AgentResponse) -> AgentResponse:
+            return await self.writeChapter(chapterSpec, novelSpec, self.build_chapter_context(chapterPlot, context), run)
 
-            # Write initial content
-            initialDraft: AgentResponse = self.agents["writer"].timed_generate(
-                self.create_chapter_writing_prompt(chapterSpec=chapterSpec, novelSpec=novelSpec, context=chatperContext),
-                f"chapter_writer_{chapterSpec.chapterNumber}"
+        async def edit(chapterSpec: ChapterSpec, initialDraft: AgentResponse) -> AgentResponse:
+            return await self.editChapter(chapterSpec, initialDraft, run)
+
+        if self.group_by_model():
+            logger.info("Chapter stages share a node with different models, running them stage by stage")
+            items = [(index, chapterSpec, None, None) for index, chapterSpec in enumerate(chapterSpecs)]
+            for handler in (plot, draft):
+                items = await self.runPhase(items, handler, results)
+            await self.runPhase(items, edit, results, last=True)
+            return results
+
+        await asyncio.gather(
+            self.pipelineStage(plots, drafts, plot, results),
+            self.pipelineStage(drafts, edits, draft, results),
+            self.pipelineStage(edits, None, edit, results),
+        )
+        return results
+
+    async def runPhase(self, items: List[tuple], handler, results: List[Any], last: bool = False) -> List[tuple]:
+        """Run one stage for every chapter before the next stage starts, so each model loads once"""
+        inbox = asyncio.Queue()
+        for item in items:
+            inbox.put_nowait(item)
+        inbox.put_nowait(None)
+        outbox = None if last else asyncio.Queue()
+        await self.pipelineStage(inbox, outbox, handler, results)
+        collected = []
+        while outbox is not None:
+            item = outbox.get_nowait()
+            if item is None:
+                break
+            collected.append(item)
+        return sorted(collected, key=lambda item: item[0])
+
+    async def pipelineStage(self, inbox: asyncio.Queue, outbox: asyncio.Queue, handler, results: List[Any]):
+        """Workers taking (index, chapterSpec, value, chapterSpan) from inbox until the None sentinel.
+
+        The chapter span is started by the first stage and travels with the
+        chapter, so every stage of it nests under one chapter span. A chapter
+        that fails is recorded as an error string in results and not passed
+        on, the last stage writes its output to results.
+        """
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    # Put the sentinel back for the sibling workers
+                    inbox.put_nowait(None)
+                    return
+                index, chapterSpec, value, span = item
+                if span is None:
+                    logger.info(f"Generating chapter {chapterSpec.chapterNumber}...")
+                    span = tracer.start_span("chapter", KIND_CHAPTER, chapter=chapterSpec.chapterNumber, model=self.llmConfig.model)
+                try:
+                    with tracer.activate(span):
+                        value = await handler(chapterSpec, value)
+                except Exception as e:
+                    logger.error(f"Error generating chapter {chapterSpec.chapterNumber}: {str(e)}")
+                    results[index] = f"Error generating chapter: {str(e)}"
+                    tracer.end_span(span, e)
+                    continue
+                except asyncio.CancelledError as e:
+                    tracer.end_span(span, e)
+                    raise
+                if outbox is None:
+                    results[index] = value
+                    tracer.end_span(span)
+                else:
+                    await outbox.put((index, chapterSpec, value, span))
+
+        await asyncio.gather(*(worker() for _ in range(self.maxConcurrentChapters)))
+        if outbox is not None:
+            await outbox.put(None)
+
+    async def createChapterPlot(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, context: dict, run: NovelRun = None) -> AgentResponse:
+        return await self.runStage(
+            f"chapter_plot_{chapterSpec.chapterNumber}",
+            "plotter",
+            self.create_chapter_plot_prompt(chapterSpec=chapterSpec, novelSpec=novelSpec, context=context),
+            f"chapter_plot_{chapterSpec.chapterNumber}",
+            prefix=self.novel_prefix(novelSpec),
+            outputTokens=CHAPTER_PLOT_TOKENS,
+            run=run
+        )
+
+    async def writeChapter(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, chapterContext: dict, run: NovelRun = None) -> AgentResponse:
+        if self.chunkPages:
+            return await self.writeChapterChunks(chapterSpec, novelSpec, chapterContext, run)
+        return await self.runStage(
+            f"chapter_writer_{chapterSpec.chapterNumber}",
+            "writer",
+            self.create_chapter_writing_prompt(chapterSpec=chapterSpec, novelSpec=novelSpec, context=chapterContext),
+            f"chapter_writer_{chapterSpec.chapterNumber}",
+            prefix=self.novel_prefix(novelSpec),
+            outputTokens=self.chapter_tokens(chapterSpec),
+            run=run
+        )
+
+    async def editChapter(self, chapterSpec: ChapterSpec, initialDraft: AgentResponse, run: NovelRun = None) -> AgentResponse:
+        if initialDraft.metadata.get("chunks"):
+            return await self.editChapterChunks(chapterSpec, initialDraft, run)
+        return await self.runStage(
+            f"chapter_Editor_{chapterSpec.chapterNumber}",
+            "editor",
+            self.create_editing_prompt(content=initialDraft.content, chapterSpec=chapterSpec),
+            f"chapter_Editor_{chapterSpec.chapterNumber}",
+            outputTokens=self.chapter_tokens(chapterSpec),
+            run=run
+        )
+
+    async def writeChapterChunks(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, chapterContext: dict, run: NovelRun = None) -> AgentResponse:
+        """Write a chapter chunkPages pages at a time.
+
+        Each chunk sees the chapter plot, an extractive rolling summary of the
+        pages before it and their last lines, so every request stays small and
+        each chunk lands on disk (and in the run manifest) as soon as it is done.
+        """
+        chunkCount = math.ceil(chapterSpec.pagesPerChapter / self.chunkPages)
+        prefix = self.novel_prefix(novelSpec) + self.chapter_plot_block(chapterContext)
+        summary = ""
+        chunks = []
+        for index in range(chunkCount):
+            firstPage = index * self.chunkPages + 1
+            lastPage = min(firstPage + self.chunkPages - 1, chapterSpec.pagesPerChapter)
+            tail = chunks[-1][-CHUNK_TAIL_CHARS:] if chunks else ""
+            response = await self.runStage(
+                f"chapter_page_{chapterSpec.chapterNumber}_{index + 1}",
+                "writer",
+                self.create_chunk_writing_prompt(chapterSpec, firstPage, lastPage, summary, tail),
+                f"chapter_writer_{chapterSpec.chapterNumber}_{index + 1}",
+                prefix=prefix,
+                outputTokens=self.chunk_tokens(chapterSpec, lastPage - firstPage + 1),
+                run=run
             )
+            chunks.append(response.content)
+            summary = leading_sentences_summary(summary, response.content.split("\n\n"), CHUNK_SUMMARY_TOKENS)
+        return self.assemble_chunks("writer", f"chapter_writer_{chapterSpec.chapterNumber}", chunks)
 
-            # return initialDraft
-        
-            # Edit content
-            finalContent: AgentResponse = self.agents["editor"].timed_generate(
-                self.create_editing_prompt(content=initialDraft.content, chapterSpec=chapterSpec),
-                f"chapter_Editor_{chapterSpec.chapterNumber}"
+    async def editChapterChunks(self, chapterSpec: ChapterSpec, initialDraft: AgentResponse, run: NovelRun = None) -> AgentResponse:
+        """Edit the chunks of a chunked draft concurrently, as far as the editor node's request slots allow"""
+        chunks = initialDraft.metadata["chunks"]
+
+        async def edit(index: int, chunk: str) -> AgentResponse:
+            return await self.runStage(
+                f"chapter_page_edit_{chapterSpec.chapterNumber}_{index + 1}",
+                "editor",
+                self.create_editing_prompt(content=chunk, chapterSpec=chapterSpec),
+                f"chapter_Editor_{chapterSpec.chapterNumber}_{index + 1}",
+                outputTokens=self.chunk_tokens(chapterSpec, self.chunkPages),
+                run=run
             )
-            
-            return finalContent
 
-        except Exception as e:
-            logger.error(f"Error generating chapter: {str(e)}")
-            return f"Error generating chapter: {str(e)}"
+        edited = await asyncio.gather(*(edit(index, chunk) for index, chunk in enumerate(chunks)))
+        return self.assemble_chunks("editor", f"chapter_Editor_{chapterSpec.chapterNumber}", [response.content for response in edited])
+
+    def assemble_chunks(self, agentKey: str, file_name: str, chunks: List[str]) -> AgentResponse:
+        """Join chunk outputs into the chapter file the single call mode would have written"""
+        agent: Agent = self.agents[agentKey]
+        response = AgentResponse(content="\n\n".join(chunk.strip() for chunk in chunks),
+                                 metadata={"agent": agent.name, "role": agent.role, "json": False, "chunks": chunks})
+        agent.write_response(response, file_name)
+        return response
+
+    def expected_stages(self, novelSpec: NovelSpec) -> int:
+        """Stages a run of novelSpec goes through: outline, profiles, then plot, write and edit per chapter"""
+        chunkCount = math.ceil(novelSpec.pagesPerChapter / self.chunkPages) if self.chunkPages else 1
+        return 2 + novelSpec.totalChapters * (1 + 2 * chunkCount)
+
+    def chunk_tokens(self, chapterSpec: ChapterSpec, pages: int) -> int:
+        return int(words_to_tokens(pages * chapterSpec.wordsPerPage) * 1.25)
+
+    def chapter_tokens(self, chapterSpec: ChapterSpec) -> int:
+        """Output budget for a chapter, its target word count plus a quarter of slack"""
+        return int(words_to_tokens(chapterSpec.pagesPerChapter * chapterSpec.wordsPerPage) * 1.25)
 
     def get_character_relationships(self, characters)-> str:
         relationships = ""
@@ -247,6 +629,19 @@ class NovelWriter:
             Character Relationships:
             {relationships}
         """
+    def novel_prefix(self, novelSpec: NovelSpec) -> str:
+        """Blocks shared by every chapter prompt. Sent first and byte for byte identical
+        across chapters so Ollama reuses the evaluated prefix instead of re-reading it"""
+        return f"""
+            Novel Description:
+            {novelSpec.description}
+
+            Novel Key Events:
+            {novelSpec.keyEvents}
+
+            {self.get_character_relationships(novelSpec.characters)}
+        """
+
     def create_chapter_plot_prompt(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, context: dict) -> str:
         return f"""
             Create a detailed plot for an erotic romantic chapter for mature audiences (18+). 
@@ -255,7 +650,6 @@ class NovelWriter:
             Current Chapter: {chapterSpec.chapterNumber}
             Current Chapter Title: {context['chapters'][chapterSpec.chapterNumber-1]['title']}
             Chapter Plot: {context['chapters'][chapterSpec.chapterNumber-1]['plot']}
-            Character Relationships: {self.get_character_relationships(novelSpec.characters)}
             Key Events to expand: {context['chapters'][chapterSpec.chapterNumber-1]['keyEvents']}
 
             Requirements:
@@ -265,6 +659,34 @@ class NovelWriter:
             - Have conversational dialogue between characters to drive the plot and create engaging scenes
         """
 
+    def chapter_plot_block(self, context: dict) -> str:
+        return f"""
+            Chapter Plot:
+            {context['plot']}
+        """
+
+    def create_chunk_writing_prompt(self, chapterSpec: ChapterSpec, firstPage: int, lastPage: int, summary: str, tail: str) -> str:
+        pages = lastPage - firstPage + 1
+        isLast = lastPage >= chapterSpec.pagesPerChapter
+        return f"""
+            Write pages {firstPage} to {lastPage} of {chapterSpec.pagesPerChapter} of Chapter {chapterSpec.chapterNumber}, approximately {pages * chapterSpec.wordsPerPage} words, for a mature audience (18+).
+            The tone should be deeply erotic and emotionally intimate. The story unfolds through the interactions and dialogue between characters.
+
+            Chapter so far:
+            {summary or 'Nothing yet, these are the opening pages of the chapter.'}
+
+            Last lines written:
+            {tail or '-'}
+
+            Requirements:
+            - Continue directly from the last lines, do not repeat them.
+            - Follow the Chapter Plot, covering the part of it that belongs on these pages.
+            - Include natural dialogue and vivid descriptions.
+            - {'Bring the chapter to its close.' if isLast else 'Do not end the chapter, more pages follow.'}
+
+            WRITE THE PAGES, not self-reflection, NOT PLOT or SUMMARY, or EXPLANATION.
+        """
+
     def create_chapter_writing_prompt(self, chapterSpec: ChapterSpec, novelSpec: NovelSpec, context: dict) -> str:
         target_words = chapterSpec.pagesPerChapter * chapterSpec.wordsPerPage
         return f"""
@@ -275,15 +697,6 @@ class NovelWriter:
             
             Focus on the chemistry between different characters.
             
-            Novel Description:
-            {context['description']}
-
-
-            Novel Key Events:
-            {context['keyEvents']}
-
-            Character Relationships: {self.get_character_relationships(novelSpec.characters)}
-            
             Chapter Plot:
             {context['plot']}
             
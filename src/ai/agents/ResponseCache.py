@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Content addressed on-disk cache of raw LLM responses with size bounded LRU eviction.
+
+    Entries are `{sha256}.json` files under `cacheDir`. The file mtime is the
+    LRU clock: hits touch it, and the oldest entries are evicted once the
+    directory grows past `maxBytes`.
+    """
+    _instances: Dict[str, 'ResponseCache'] = {}
+    _instancesLock = threading.Lock()
+
+    def __init__(self, cacheDir: str, maxBytes: int = 256 * 1024 * 1024):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+        os.makedirs(cacheDir, exist_ok=True)
+        self._sizes: Dict[str, int] = {}
+        for entry in os.scandir(cacheDir):
+            if entry.name.endswith(".json"):
+                self._sizes[entry.path] = entry.stat().st_size
+        self._totalBytes = sum(self._sizes.values())
+
+    @classmethod
+    def for_config(cls, llmConfig) -> Optional['ResponseCache']:
+        """Shared cache for the config's cacheDir, None when caching is disabled"""
+        cacheDir = getattr(llmConfig, "cacheDir", None)
+        if not getattr(llmConfig, "useCache", False) or not cacheDir:
+            return None
+        with cls._instancesLock:
+            cache = cls._instances.get(cacheDir)
+            if cache is None:
+                cache = cls(cacheDir, llmConfig.cacheMaxBytes)
+                cls._instances[cacheDir] = cache
+            return cache
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, content: str, **metadata: Any):
+        path = self._path(key)
+        data = json.dumps({"content": content, "createdAt": time.time(), **metadata})
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._totalBytes += len(data) - self._sizes.get(path, 0)
+            self._sizes[path] = len(data)
+            if self._totalBytes > self.maxBytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self._sizes:
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                entries.append((0.0, path))
+        entries.sort()
+        for _, path in entries:
+            if self._totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._totalBytes -= self._sizes.pop(path)
+            logger.debug(f"Evicted cached response {path}")
+
+    def clear(self):
+        with self._lock:
+            for path in list(self._sizes):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._sizes.clear()
+            self._totalBytes = 0
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from dataclasses import asdict
+from typing import Any, Dict, Optional
+from ai.models.novel.Schema import NovelSpec, AgentResponse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class RunManifest:
+    """Progress of a novel generation run, rewritten to disk after every stage.
+
+    Each stage (novel_outline, character_profiles, chapter_plot_N, ...) records
+    its status and the `.md` file its output was written to, so a resumed run can
+    load finished stages from disk instead of generating them again.
+    """
+    def __init__(self, path: str, specHash: str, stages: Dict[str, Dict[str, Any]] = None):
+        self.path = path
+        self.specHash = specHash
+        self.stages: Dict[str, Dict[str, Any]] = stages or {}
+
+    @staticmethod
+    def spec_hash(novelSpec: NovelSpec) -> str:
+        payload = json.dumps(asdict(novelSpec), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def open(cls, path: str, novelSpec: NovelSpec, resume: bool = False) -> 'RunManifest':
+        """Load the manifest at path when resuming a run of the same spec, otherwise start a new one"""
+        specHash = cls.spec_hash(novelSpec)
+        if resume and os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("specHash") == specHash:
+                manifest = cls(path, specHash, data.get("stages"))
+                logger.info(f"Resuming run from {path}, {len(manifest.completed())} stages already done.")
+                return manifest
+            logger.warning(f"Novel spec changed since {path} was written, starting a new run.")
+        manifest = cls(path, specHash)
+        manifest.save()
+        return manifest
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"specHash": self.specHash, "updatedAt": time.time(), "stages": self.stages}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def mark(self, stage: str, status: str, **details: Any):
+        entry = self.stages.setdefault(stage, {})
+        entry.update(details)
+        entry["status"] = status
+        entry["updatedAt"] = time.time()
+        self.save()
+
+    def require(self, stage: str):
+        """Forget every other stage unless stage is done. They were generated from its
+        output, e.g. chapter plots started from a still streaming outline, and running
+        stage again produces a different one"""
+        if self.stages.get(stage, {}).get("status") == STATUS_DONE:
+            return
+        dropped = [name for name in self.stages if name != stage]
+        if dropped:
+            logger.warning(f"Stage {stage} did not finish, discarding {len(dropped)} stages generated from it.")
+            self.stages = {name: entry for name, entry in self.stages.items() if name == stage}
+            self.save()
+
+    def completed(self):
+        return [stage for stage, entry in self.stages.items() if entry.get("status") == STATUS_DONE]
+
+    def load_output(self, stage: str) -> Optional[AgentResponse]:
+        """Output of a finished stage, None when the stage still has to run"""
+        entry = self.stages.get(stage)
+        if entry is None or entry.get("status") != STATUS_DONE:
+            return None
+        output = entry.get("output")
+        if not output or not os.path.exists(output):
+            logger.warning(f"Output for stage {stage} is missing, regenerating it.")
+            return None
+        with open(output, 'r') as f:
+            content = json.load(f) if entry.get("json") else f.read()
+        return AgentResponse(content=content, metadata={"agent": entry.get("agent"), "json": entry.get("json", False), "resumed": True})
@@ -1,16 +1,71 @@
 import logging
 from ai.agents.Agent import Agent
+from ai.backend.ModelResidency import ModelResidency
+from ai.agents.CommandRouter import CommandRouter
+from ai.operators.executer import ALLOWED_COMMANDS
 from ai.models.LLMConfig import LLMConfig
-from typing import List
+import json
+from typing import Any, Dict, List, Optional
 from ai.models.novel.Schema import AgentResponse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "steps": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "action": {
+                        "type": "string",
+                        "enum": ["run_shell_command"]
+                    },
+                    "command": {
+                        "type": "string",
+                        "enum": ALLOWED_COMMANDS
+                    },
+                    "command_args": {
+                        "type": "string"
+                    },
+                    "depends_on": {
+                        "type": "array", "items": {"type": "string"}
+                    }
+                },
+                "required": ["id", "action", "command"]
+            }
+        }
+    },
+    "required": ["steps"]
+}
+
+# Tool description first and unchanged between queries so Ollama can reuse it
+TOOLS_PROMPT = """
+    You are a system agent. Use tools and capabilities provided by agent to generate a response.
+    Tools and capabilities:
+    Actions:
+        - run_shell_command: Run a shell command.
+    commands:
+        - run_shell_command: Run a shell command.
+        - whoami: Get the current user name.
+        - ls: List files in the current directory. ls -ltr /home
+        - du: Display disk usage.
+        - df: Display disk space.
+        - pwd: Print the current working directory.
+    Plan:
+        - Answer with a list of steps, one command per step, each with a short unique id.
+        - Use as few steps as the prompt needs, list the ids a step must wait for in depends_on.
+        - Steps without depends_on run at the same time.
+"""
+
 
 class SystemAgent:
-    def __init__(self, llmConfig: LLMConfig):
+    def __init__(self, llmConfig: LLMConfig, preloadModel: bool = True):
+        self.llmConfig = llmConfig
         self.agents = {
             "egor": Agent(
                 name="egor",
@@ -19,44 +74,84 @@ class SystemAgent:
                 llmConfig=llmConfig
             )
         }
+        self.router = CommandRouter()
+        # Load the model while the user types the first command and keep it loaded until close()
+        self.preloaded = preloadModel
+        if preloadModel:
+            ModelResidency.acquire(llmConfig)
+
+    def close(self, releaseKeepAlive=None):
+        """Unpin the model, it stays loaded for llmConfig.keepAlive unless releaseKeepAlive says otherwise, 0 unloads it"""
+        if self.preloaded:
+            ModelResidency.release(self.llmConfig, releaseKeepAlive)
+            self.preloaded = False
+
+    def resolve(self, prompt: str) -> AgentResponse:
+        """Action for a prompt, from the command router when it recognises it, otherwise from the LLM"""
+        routed = self.routed(prompt)
+        if routed is not None:
+            return routed
+        return self.remember(prompt, self.queryLLM(prompt))
+
+    async def aresolve(self, prompt: str) -> AgentResponse:
+        """Async variant of resolve, the LLM call does not block the event loop"""
+        routed = self.routed(prompt)
+        if routed is not None:
+            return routed
+        return self.remember(prompt, await self.aqueryLLM(prompt))
+
+    def routed(self, prompt: str) -> Optional[AgentResponse]:
+        routed = self.router.route(prompt)
+        if routed is None:
+            return None
+        action, route = routed
+        commands = [step.get("command") for step in action.get("steps", [action])]
+        logger.info(f"Routed '{prompt}' to {', '.join(commands)} ({route}) without the LLM")
+        return AgentResponse(content=action, metadata={"agent": "egor", "json": True, "route": route})
+
+    def remember(self, prompt: str, response: AgentResponse) -> AgentResponse:
+        if isinstance(response.content, dict):
+            self.router.remember(prompt, response.content)
+        response.metadata["route"] = "llm"
+        return response
 
     def queryLLM(self, prompt: str) -> str:
-        """Query the LLM with a prompt and return the response"""
-
-        responseSchema = {
-            "type": "object",
-            "properties": {
-                "action": {
-                    "type": "string",
-                    "enum": ["run_shell_command"]
-                },
-                "command": {
-                    "type": "string",
-                    "enum": ["ls", "du", "df", "whoami", "pwd"]
-                },
-                "command_args": {
-                    "type": "string"
-                }
-            },
-            "required": ["action", "command"]
-        }
-        agentPrompt = f"""
-            You are a system agent. Use tools and capabilities provided by agent to generate a response.
-            Tools and capabilities:
-            Actions:
-                - run_shell_command: Run a shell command.
-            commands:
-                - run_shell_command: Run a shell command.
-                - whoami: Get the current user name.
-                - ls: List files in the current directory. ls -ltr /home
-                - du: Display disk usage.
-                - df: Display disk space.
-                - pwd: Print the current working directory.
+        """Query the LLM for a plan of steps answering the prompt.
 
+        Steps without depends_on run concurrently (see executer.aexecute_plan),
+        so one round trip covers requests that need several commands.
+        """
+        action_response: AgentResponse  = self.agents['egor'].timed_generate(self.action_prompt(prompt), "action_response", ACTION_SCHEMA, prefix=TOOLS_PROMPT)
+        print(action_response)
+
+        return action_response
+
+    async def aqueryLLM(self, prompt: str) -> AgentResponse:
+        """Async variant of queryLLM, for callers serving several prompts at once"""
+        return await self.agents['egor'].atimed_generate(self.action_prompt(prompt), "action_response", ACTION_SCHEMA, prefix=TOOLS_PROMPT)
+
+    def action_prompt(self, prompt: str) -> str:
+        return f"""
             Prompt: {prompt}
         """
 
-        action_response: AgentResponse  = self.agents['egor'].timed_generate(agentPrompt, "action_response", responseSchema)
-        print(action_response)
+    def summarize(self, prompt: str, plan: Dict[str, Any], results: Dict[str, Any]) -> AgentResponse:
+        """Single follow-up call answering the prompt from the results of every plan step"""
+        return self.agents['egor'].timed_generate(self.summary_prompt(prompt, plan, results), "action_summary")
 
-        return action_response
\ No newline at end of file
+    async def asummarize(self, prompt: str, plan: Dict[str, Any], results: Dict[str, Any]) -> AgentResponse:
+        return await self.agents['egor'].atimed_generate(self.summary_prompt(prompt, plan, results), "action_summary")
+
+    def summary_prompt(self, prompt: str, plan: Dict[str, Any], results: Dict[str, Any]) -> str:
+        outcomes = json.dumps([
+            {"id": stepId, "command": f"{step.get('command')} {step.get('command_args', '')}".strip(), "result": results.get(stepId)}
+            for stepId, step in zip(results.keys(), plan.get("steps", []))
+        ], indent=2)
+        return f"""
+            Prompt: {prompt}
+
+            Commands run for this prompt and their results:
+            {outcomes}
+
+            Answer the prompt from these results in a few sentences.
+        """
@@ -0,0 +1,71 @@
+import logging
+import threading
+from typing import Dict, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TokenBudget:
+    """Sizes Ollama's num_ctx and num_predict per request from estimated token counts.
+
+    num_ctx is the smallest power of two that fits prompt plus output (with a
+    safety margin for the character based estimate), clamped to maxContext.
+    It never shrinks for a model: Ollama reloads the model whenever num_ctx
+    changes, so a run settles on the window of its largest prompt instead of
+    flipping between sizes.
+    """
+    _instances: Dict[Tuple[Tuple[str, ...], str], 'TokenBudget'] = {}
+    _instancesLock = threading.Lock()
+
+    def __init__(self, maxContext: int = 16384, minContext: int = 2048, defaultPredict: int = 2048,
+                 minPredict: int = 256, margin: float = 0.1):
+        self.maxContext = maxContext
+        self.minContext = min(minContext, maxContext)
+        self.defaultPredict = defaultPredict
+        self.minPredict = minPredict
+        self.margin = margin
+        self.numCtx = self.minContext
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_config(cls, llmConfig) -> 'TokenBudget':
+        """Budget shared by every agent using the same model on the same nodes"""
+        key = (tuple(llmConfig.endpoints()), llmConfig.model)
+        with cls._instancesLock:
+            budget = cls._instances.get(key)
+            if budget is None:
+                budget = cls(maxContext=llmConfig.maxContext)
+                cls._instances[key] = budget
+            return budget
+
+    def padded(self, tokens: int) -> int:
+        return int(tokens * (1 + self.margin))
+
+    def context_size(self, tokens: int) -> int:
+        size = self.minContext
+        while size < tokens and size < self.maxContext:
+            size *= 2
+        return min(size, self.maxContext)
+
+    def prompt_limit(self) -> int:
+        """Largest prompt that still leaves minPredict tokens to generate"""
+        return int((self.maxContext - self.minPredict) / (1 + self.margin))
+
+    def fits(self, promptTokens: int, outputTokens: int) -> bool:
+        return self.padded(promptTokens) + outputTokens <= self.maxContext
+
+    def plan(self, promptTokens: int, outputTokens: int = None) -> Tuple[int, int]:
+        """(num_ctx, num_predict) for a request, num_predict is trimmed to what is left of the window"""
+        outputTokens = outputTokens or self.defaultPredict
+        needed = self.padded(promptTokens) + outputTokens
+        with self._lock:
+            self.numCtx = max(self.numCtx, self.context_size(needed))
+            numCtx = self.numCtx
+        numPredict = min(outputTokens, numCtx - self.padded(promptTokens))
+        if numPredict < outputTokens:
+            logger.warning(f"Prompt of ~{promptTokens} tokens leaves {numPredict} of {outputTokens} requested output tokens in a {numCtx} token context"
+                           f"{', below the minimum of ' + str(self.minPredict) + ', expect a truncated response' if numPredict < self.minPredict else ''}.")
+        # Never ask for more than the window holds, Ollama would only cut the response at the context end
+        return numCtx, max(numPredict, 1)
@@ -0,0 +1,110 @@
+import time
+import inspect
+import logging
+from typing import Any, List, Optional
+from ai.models.novel.Schema import GenerationStats
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NANOS_PER_MS = 1_000_000
+
+
+def stats_from_response(response: Any, start_time: float, first_token_time: Optional[float] = None, output: str = "") -> GenerationStats:
+    """Build GenerationStats from the final Ollama response (or stream chunk) of a call"""
+    end_time = time.time()
+    stats = GenerationStats(totalMs=(end_time - start_time) * 1000, outputChars=len(output))
+    if first_token_time is not None:
+        stats.ttftMs = (first_token_time - start_time) * 1000
+    if response is not None:
+        stats.promptEvalCount = getattr(response, "prompt_eval_count", None)
+        stats.evalCount = getattr(response, "eval_count", None)
+        stats.doneReason = getattr(response, "done_reason", None)
+        durations = (
+            ("loadDurationMs", "load_duration"),
+            ("promptEvalDurationMs", "prompt_eval_duration"),
+            ("evalDurationMs", "eval_duration"),
+            ("serverTotalMs", "total_duration"),
+        )
+        for field, attr in durations:
+            value = getattr(response, attr, None)
+            if value is not None:
+                setattr(stats, field, value / NANOS_PER_MS)
+    if stats.evalCount and stats.evalDurationMs:
+        stats.tokensPerSec = stats.evalCount / (stats.evalDurationMs / 1000)
+    return stats
+
+
+class TokenStream:
+    """Tokens of a streamed generation, appended to `path` as they arrive.
+
+    Iterate with `for` over a sync source and `async for` over an async one.
+    `text` and `stats` are available once iteration ends, and the output file
+    keeps whatever was generated even if the stream fails midway.
+    """
+    def __init__(self, source: Any, path: Optional[str] = None):
+        self.source = source
+        self.path = path
+        self.parts: List[str] = []
+        self.stats: Optional[GenerationStats] = None
+        self._file = None
+        self._final = None
+        self._start_time = None
+        self._first_token_time = None
+        self._chunkCount = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def __iter__(self):
+        self._open()
+        try:
+            for chunk in self.source:
+                token = self._add(chunk)
+                if token:
+                    yield token
+        finally:
+            self._close()
+
+    async def __aiter__(self):
+        self._open()
+        try:
+            source = await self.source if inspect.isawaitable(self.source) else self.source
+            async for chunk in source:
+                token = self._add(chunk)
+                if token:
+                    yield token
+        finally:
+            self._close()
+
+    def _open(self):
+        self._start_time = time.time()
+        if self.path is not None:
+            self._file = open(self.path, 'w')
+
+    def _add(self, chunk: Any) -> str:
+        token = chunk.response
+        if getattr(chunk, "done", False):
+            self._final = chunk
+        if token:
+            if self._first_token_time is None:
+                self._first_token_time = time.time()
+            self._chunkCount += 1
+            self.parts.append(token)
+            if self._file is not None:
+                self._file.write(token)
+                self._file.flush()
+        return token
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.stats = stats_from_response(self._final, self._start_time, self._first_token_time, self.text)
+        if self.stats.tokensPerSec is None and self._first_token_time is not None:
+            # Server counters are only sent with the final chunk, fall back to counting chunks
+            elapsed = time.time() - self._first_token_time
+            if elapsed > 0:
+                self.stats.tokensPerSec = self._chunkCount / elapsed
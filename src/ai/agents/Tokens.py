@@ -0,0 +1,25 @@
+import math
+
+# Average characters per token for English prose with llama/gemma style tokenizers
+CHARS_PER_TOKEN = 4.0
+# Average tokens per English word, for sizing outputs requested in words
+TOKENS_PER_WORD = 1.35
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting without loading a tokenizer"""
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def words_to_tokens(words: int) -> int:
+    return int(math.ceil(words * TOKENS_PER_WORD))
+
+
+def truncate_to_tokens(text: str, maxTokens: int) -> str:
+    """Cut text so that estimate_tokens(text) <= maxTokens"""
+    maxChars = int(maxTokens * CHARS_PER_TOKEN)
+    if len(text) <= maxChars:
+        return text
+    return text[:maxChars]
@@ -0,0 +1,133 @@
+import json
+import atexit
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from ollama import Client, AsyncClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PooledClient:
+    """Ollama client bound to a model and a default set of options.
+
+    All PooledClients pointing at the same base_url share one keep-alive
+    httpx connection pool, so creating one is cheap and no TCP setup is paid per call.
+    The async pool is created lazily per event loop, since httpx async connections
+    cannot be shared between loops.
+    """
+    def __init__(self, client: Client, base_url: str, model: str, options: Dict[str, Any], maxConnections: int = 8):
+        self.client = client
+        self.base_url = base_url
+        self.model = model
+        self.options = options
+        self.maxConnections = maxConnections
+
+    def _merge_options(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        options = dict(self.options)
+        options.update(kwargs.pop("options", None) or {})
+        return options
+
+    def generate(self, prompt: str, **kwargs):
+        options = self._merge_options(kwargs)
+        return self.client.generate(model=self.model, prompt=prompt, options=options, **kwargs)
+
+    async def agenerate(self, prompt: str, **kwargs):
+        options = self._merge_options(kwargs)
+        client = ClientRegistry.get_async_host_client(self.base_url, self.maxConnections)
+        return await client.generate(model=self.model, prompt=prompt, options=options, **kwargs)
+
+
+class ClientRegistry:
+    """Process wide registry of pooled Ollama clients keyed by (base_url, model, options)"""
+    maxKeepaliveConnections: int = 8
+    keepaliveExpiry: float = 300.0
+
+    _lock = threading.Lock()
+    _hosts: Dict[str, Client] = {}
+    _asyncHosts: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncClient]]" = weakref.WeakKeyDictionary()
+    _clients: Dict[Tuple[str, str, str], PooledClient] = {}
+
+    @staticmethod
+    def normalize_url(base_url: str) -> str:
+        return base_url.rstrip("/")
+
+    @staticmethod
+    def key(base_url: str, model: str, options: Optional[Dict[str, Any]] = None) -> Tuple[str, str, str]:
+        return (ClientRegistry.normalize_url(base_url), model, json.dumps(options or {}, sort_keys=True, default=str))
+
+    @classmethod
+    def get_host_client(cls, base_url: str, maxConnections: int = 8) -> Client:
+        """Return the shared keep-alive client for a host, creating it on first use"""
+        base_url = cls.normalize_url(base_url)
+        with cls._lock:
+            client = cls._hosts.get(base_url)
+            if client is None:
+                logger.info(f"Creating pooled Ollama client for {base_url} (max {maxConnections} connections)")
+                client = Client(host=base_url, limits=cls._limits(maxConnections))
+                cls._hosts[base_url] = client
+            return client
+
+    @staticmethod
+    def _limits(maxConnections: int) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=maxConnections,
+            max_keepalive_connections=min(maxConnections, ClientRegistry.maxKeepaliveConnections),
+            keepalive_expiry=ClientRegistry.keepaliveExpiry,
+        )
+
+    @classmethod
+    def get_async_host_client(cls, base_url: str, maxConnections: int = 8) -> AsyncClient:
+        """Return the shared keep-alive async client for a host on the running event loop"""
+        base_url = cls.normalize_url(base_url)
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            hosts = cls._asyncHosts.setdefault(loop, {})
+            client = hosts.get(base_url)
+            if client is None:
+                logger.info(f"Creating pooled async Ollama client for {base_url} (max {maxConnections} connections)")
+                client = AsyncClient(host=base_url, limits=cls._limits(maxConnections))
+                hosts[base_url] = client
+            return client
+
+    @classmethod
+    async def aclose_loop(cls):
+        """Close the async pools owned by the running event loop"""
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            hosts = cls._asyncHosts.pop(loop, {})
+        for client in hosts.values():
+            await client._client.aclose()
+
+    @classmethod
+    def get_client(cls, base_url: str, model: str, options: Optional[Dict[str, Any]] = None, maxConnections: int = 8) -> PooledClient:
+        """Return the PooledClient for (base_url, model, options)"""
+        key = cls.key(base_url, model, options)
+        pooled = cls._clients.get(key)
+        if pooled is not None:
+            return pooled
+        host = cls.get_host_client(base_url, maxConnections)
+        with cls._lock:
+            pooled = cls._clients.setdefault(key, PooledClient(host, key[0], model, dict(options or {}), maxConnections))
+        return pooled
+
+    @classmethod
+    def close_all(cls):
+        """Close every pooled connection, used at interpreter shutdown"""
+        with cls._lock:
+            for client in cls._hosts.values():
+                try:
+                    client._client.close()
+                except Exception as error:
+                    logger.warning(f"Failed to close Ollama client: {error}")
+            cls._hosts.clear()
+            cls._clients.clear()
+
+
+atexit.register(ClientRegistry.close_all)
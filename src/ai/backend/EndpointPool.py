@@ -0,0 +1,296 @@
+import time
+import zlib
+import asyncio
+import inspect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import httpx
+from ollama import ResponseError
+from ai.tracing.Tracer import tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEAST_OUTSTANDING = "least_outstanding"
+MODEL_AFFINITY = "model_affinity"
+ROUTING_STRATEGIES = [LEAST_OUTSTANDING, MODEL_AFFINITY]
+
+
+class NoHealthyEndpointError(ConnectionError):
+    pass
+
+
+class Endpoint:
+    """One Ollama node with its in-flight request count, health and loaded models"""
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.unhealthySince: Optional[float] = None
+        # Set while a health probe of this node is in flight
+        self.probing = False
+        self.loadedModels: Set[str] = set()
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+def is_failover_error(error: Exception) -> bool:
+    """Errors that mean the node is unusable, as opposed to a bad request"""
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError, OSError))
+
+
+class EndpointPool:
+    """Routes Ollama calls across several nodes.
+
+    Strategies:
+    - least_outstanding: node with the fewest in-flight requests
+    - model_affinity: prefer nodes that already have the model loaded, otherwise
+      a stable node per model, so weights are not reloaded on every node
+
+    A node that fails with a connection or 5xx error is marked unhealthy and the
+    call fails over to the next node. Once its `cooldown` has passed the node is
+    probed (GET /api/ps) before a request is sent to it again: a node that
+    answers is healthy again, one that does not starts a new cooldown and the
+    request goes elsewhere. check_health() probes every node on demand.
+    """
+    _pools: Dict[Tuple[Tuple[str, ...], str], 'EndpointPool'] = {}
+    _poolsLock = threading.Lock()
+
+    def __init__(self, urls: List[str], strategy: str = LEAST_OUTSTANDING, cooldown: float = 30.0, healthTimeout: float = 2.0):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy}, expected one of {ROUTING_STRATEGIES}")
+        self.endpoints = [Endpoint(url.rstrip("/")) for url in urls]
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.healthTimeout = healthTimeout
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_config(cls, llmConfig) -> 'EndpointPool':
+        """Shared pool for the config's endpoints, so all agents see the same load"""
+        urls = tuple(url.rstrip("/") for url in llmConfig.endpoints())
+        key = (urls, llmConfig.routing)
+        with cls._poolsLock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(list(urls), llmConfig.routing)
+                cls._pools[key] = pool
+            return pool
+
+    def _available(self, exclude: Set[str]) -> List[Endpoint]:
+        now = time.time()
+        remaining = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude]
+        available = [endpoint for endpoint in remaining
+                     if endpoint.healthy or (not endpoint.probing and now - endpoint.unhealthySince >= self.cooldown)]
+        # When every node is cooling down, still try them rather than failing without a request
+        return available or remaining
+
+    def select(self, model: str, exclude: Set[str] = frozenset()) -> Endpoint:
+        with self._lock:
+            candidates = self._available(exclude)
+            if not candidates:
+                raise NoHealthyEndpointError(f"No healthy Ollama endpoint for {model}")
+            if self.strategy == MODEL_AFFINITY:
+                loaded = [endpoint for endpoint in candidates if model in endpoint.loadedModels]
+                if loaded:
+                    candidates = loaded
+                elif len(candidates) > 1:
+                    # Nobody has it loaded yet, pin the model to a stable node
+                    preferred = self.endpoints[zlib.crc32(model.encode("utf-8")) % len(self.endpoints)]
+                    if preferred in candidates and preferred.outstanding <= min(e.outstanding for e in candidates):
+                        return preferred
+            return min(candidates, key=lambda endpoint: endpoint.outstanding)
+
+    @contextmanager
+    def _track(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.outstanding += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def mark_success(self, endpoint: Endpoint, model: str):
+        with self._lock:
+            if not endpoint.healthy:
+                logger.info(f"Ollama endpoint {endpoint.url} is healthy again")
+            endpoint.healthy = True
+            endpoint.failures = 0
+            endpoint.unhealthySince = None
+            endpoint.loadedModels.add(model)
+
+    def mark_failure(self, endpoint: Endpoint, error: Exception):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.healthy = False
+            endpoint.unhealthySince = time.time()
+        logger.warning(f"Ollama endpoint {endpoint.url} failed ({error}), failing over")
+
+    def call(self, model: str, fn: Callable[[str], Any]) -> Any:
+        """Run fn(url) on a selected node, failing over to the others on node errors"""
+        tried: Set[str] = set()
+        while True:
+            endpoint = self._next(model, tried)
+            with self._track(endpoint):
+                try:
+                    result = fn(endpoint.url)
+                except Exception as error:
+                    if not is_failover_error(error):
+                        raise
+                    self.mark_failure(endpoint, error)
+                    continue
+            self.mark_success(endpoint, model)
+            return result
+
+    async def acall(self, model: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        """Async variant of call"""
+        tried: Set[str] = set()
+        while True:
+            endpoint = await self._anext(model, tried)
+            with self._track(endpoint):
+                try:
+                    result = await fn(endpoint.url)
+                except Exception as error:
+                    if not is_failover_error(error):
+                        raise
+                    self.mark_failure(endpoint, error)
+                    continue
+            self.mark_success(endpoint, model)
+            return result
+
+    def iterate(self, model: str, fn: Callable[[str], Iterator[Any]]) -> Iterator[Any]:
+        """Stream fn(url) from a selected node. Fails over only until the first chunk
+        arrives, after that an error is raised to the caller"""
+        tried: Set[str] = set()
+        while True:
+            endpoint = self._next(model, tried)
+            started = False
+            with self._track(endpoint):
+                try:
+                    for chunk in fn(endpoint.url):
+                        started = True
+                        yield chunk
+                except Exception as error:
+                    if started or not is_failover_error(error):
+                        raise
+                    self.mark_failure(endpoint, error)
+                    continue
+            self.mark_success(endpoint, model)
+            return
+
+    async def aiterate(self, model: str, fn: Callable[[str], Any]):
+        """Async variant of iterate, fn may return an async iterator or an awaitable of one"""
+        tried: Set[str] = set()
+        while True:
+            endpoint = await self._anext(model, tried)
+            started = False
+            with self._track(endpoint):
+                try:
+                    source = fn(endpoint.url)
+                    if inspect.isawaitable(source):
+                        source = await source
+                    async for chunk in source:
+                        started = True
+                        yield chunk
+                except Exception as error:
+                    if started or not is_failover_error(error):
+                        raise
+                    self.mark_failure(endpoint, error)
+                    continue
+            self.mark_success(endpoint, model)
+            return
+
+    def _probe_due(self, exclude: Set[str]) -> List[Endpoint]:
+        """Unhealthy nodes whose cooldown has passed, claimed so concurrent callers probe each one once"""
+        now = time.time()
+        with self._lock:
+            due = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude and not endpoint.healthy
+                   and not endpoint.probing and now - endpoint.unhealthySince >= self.cooldown]
+            for endpoint in due:
+                endpoint.probing = True
+        return due
+
+    def _next(self, model: str, tried: Set[str]) -> Endpoint:
+        for endpoint in self._probe_due(tried):
+            self.probe(endpoint)
+        return self._select_next(model, tried)
+
+    async def _anext(self, model: str, tried: Set[str]) -> Endpoint:
+        """Async variant of _next, probes without blocking the event loop"""
+        await asyncio.gather(*(self.aprobe(endpoint) for endpoint in self._probe_due(tried)))
+        return self._select_next(model, tried)
+
+    def _select_next(self, model: str, tried: Set[str]) -> Endpoint:
+        endpoint = self.select(model, tried)
+        tried.add(endpoint.url)
+        span = tracer.current_span()
+        if span is not None:
+            span.set(endpoint=endpoint.url, attempts=len(tried))
+        return endpoint
+
+    def _apply_health(self, endpoint: Endpoint, models: Optional[List[str]], error: Optional[Exception]):
+        if error is not None:
+            with self._lock:
+                endpoint.healthy = False
+                endpoint.probing = False
+                # A failed probe starts a new cooldown
+                endpoint.unhealthySince = time.time()
+            logger.warning(f"Health check failed for {endpoint.url}: {error}")
+            return
+        with self._lock:
+            if not endpoint.healthy:
+                logger.info(f"Ollama endpoint {endpoint.url} is healthy again")
+            endpoint.healthy = True
+            endpoint.probing = False
+            endpoint.failures = 0
+            endpoint.unhealthySince = None
+            endpoint.loadedModels = set(models)
+
+    @staticmethod
+    def _loaded_models(response: httpx.Response) -> List[str]:
+        response.raise_for_status()
+        return [entry.get("name") for entry in response.json().get("models", [])]
+
+    def probe(self, endpoint: Endpoint):
+        """Ping one node and refresh which models it has loaded (GET /api/ps)"""
+        try:
+            models = self._loaded_models(httpx.get(f"{endpoint.url}/api/ps", timeout=self.healthTimeout))
+        except Exception as error:
+            self._apply_health(endpoint, None, error)
+        else:
+            self._apply_health(endpoint, models, None)
+
+    async def aprobe(self, endpoint: Endpoint, client: httpx.AsyncClient = None):
+        """Async variant of probe"""
+        try:
+            if client is None:
+                async with httpx.AsyncClient(timeout=self.healthTimeout) as client:
+                    response = await client.get(f"{endpoint.url}/api/ps")
+            else:
+                response = await client.get(f"{endpoint.url}/api/ps")
+            models = self._loaded_models(response)
+        except Exception as error:
+            self._apply_health(endpoint, None, error)
+        else:
+            self._apply_health(endpoint, models, None)
+
+    def check_health(self):
+        """Probe every node"""
+        for endpoint in self.endpoints:
+            self.probe(endpoint)
+
+    async def acheck_health(self):
+        """Async variant of check_health, probes all nodes concurrently"""
+        async with httpx.AsyncClient(timeout=self.healthTimeout) as client:
+            await asyncio.gather(*(self.aprobe(endpoint, client) for endpoint in self.endpoints))
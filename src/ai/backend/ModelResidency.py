@@ -0,0 +1,110 @@
+import logging
+import threading
+from typing import Dict, Set, Tuple, Union
+from ai.backend.ClientRegistry import ClientRegistry
+from ai.backend.EndpointPool import EndpointPool, MODEL_AFFINITY, is_failover_error
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# keep_alive sent while a model is held. Finite, so a process that dies without release() does not keep
+# the model loaded until the node restarts, and long, so every request renewing it keeps the model resident
+PIN = "2h"
+
+
+class ModelResidency:
+    """Keeps models loaded on their Ollama nodes for as long as someone holds them.
+
+    The first acquire() of a model preloads it (an empty generate request) with
+    keep_alive pinned, so the load is paid once up front instead of inside the
+    first stage. While held, Agent requests send the same pin, renewing it on
+    every call, so their own keep_alive never shortens it. The pin expires on
+    its own if the process dies while holding the model. The last release()
+    hands the model back to its configured keepAlive, or to releaseKeepAlive
+    when given, 0 unloads the model right away. Only the nodes the model was
+    pinned on are released, a keep_alive request loads the model, so sending
+    it to a node that never held it would load it there.
+    """
+    _lock = threading.Lock()
+    _holders: Dict[Tuple[Tuple[str, ...], str], int] = {}
+    _pinnedOn: Dict[Tuple[Tuple[str, ...], str], Set[str]] = {}
+
+    @staticmethod
+    def key(llmConfig) -> Tuple[Tuple[str, ...], str]:
+        return (tuple(llmConfig.endpoints()), llmConfig.model)
+
+    @classmethod
+    def is_pinned(cls, llmConfig) -> bool:
+        with cls._lock:
+            return cls._holders.get(cls.key(llmConfig), 0) > 0
+
+    @classmethod
+    def keep_alive(cls, llmConfig) -> Union[str, int, None]:
+        """keep_alive to send with a request for this config's model"""
+        return PIN if cls.is_pinned(llmConfig) else llmConfig.keepAlive
+
+    @classmethod
+    def acquire(cls, llmConfig, background: bool = True):
+        """Hold the model, preloading it on first acquire (in a daemon thread when background)"""
+        with cls._lock:
+            key = cls.key(llmConfig)
+            cls._holders[key] = cls._holders.get(key, 0) + 1
+            first = cls._holders[key] == 1
+        if first:
+            if background:
+                threading.Thread(target=cls.preload, args=(llmConfig,), daemon=True, name=f"preload-{llmConfig.model}").start()
+            else:
+                cls.preload(llmConfig)
+
+    @classmethod
+    def release(cls, llmConfig, releaseKeepAlive: Union[str, int, None] = None):
+        """Drop a hold, the last one unpins the model by sending releaseKeepAlive (llmConfig.keepAlive by default)"""
+        with cls._lock:
+            key = cls.key(llmConfig)
+            holders = cls._holders.get(key, 0) - 1
+            if holders > 0:
+                cls._holders[key] = holders
+                return
+            cls._holders.pop(key, None)
+            urls = sorted(cls._pinnedOn.pop(key, ()))
+        keepAlive = llmConfig.keepAlive if releaseKeepAlive is None else releaseKeepAlive
+        cls.send_keep_alive(llmConfig, keepAlive, urls)
+
+    @classmethod
+    def mark_pinned(cls, llmConfig, url: str) -> bool:
+        """Record that url got the pin (a preload or a request sent while held), False when the model is not held"""
+        with cls._lock:
+            key = cls.key(llmConfig)
+            if cls._holders.get(key, 0) <= 0:
+                return False
+            cls._pinnedOn.setdefault(key, set()).add(url)
+            return True
+
+    @classmethod
+    def preload(cls, llmConfig):
+        """Load the model and pin it, on its affinity node or on every node of the pool"""
+        pool = EndpointPool.for_config(llmConfig)
+        if pool.strategy == MODEL_AFFINITY:
+            urls = [pool.select(llmConfig.model).url]
+        else:
+            urls = llmConfig.endpoints()
+        # Released before the preload thread got here, nothing left to pin
+        urls = [url for url in urls if cls.mark_pinned(llmConfig, url)]
+        if not urls:
+            return
+        logger.info(f"Preloading {llmConfig.model} on {', '.join(urls)}")
+        cls.send_keep_alive(llmConfig, PIN, urls)
+
+    @staticmethod
+    def send_keep_alive(llmConfig, keepAlive: Union[str, int, None], urls):
+        for url in urls:
+            try:
+                client = ClientRegistry.get_host_client(url, llmConfig.maxConnections)
+                response = client.generate(model=llmConfig.model, keep_alive=keepAlive)
+                if response.load_duration:
+                    logger.info(f"{llmConfig.model} loaded on {url} in {response.load_duration / 1e6:.0f}ms")
+            except Exception as e:
+                if not is_failover_error(e):
+                    raise
+                logger.warning(f"Could not set keep_alive of {llmConfig.model} on {url}: {str(e)}")
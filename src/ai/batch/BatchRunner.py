@@ -0,0 +1,136 @@
+import os
+import glob
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from ai.agents.NovelWriter import NovelWriter
+from ai.agents.RunManifest import RunManifest
+from ai.batch.JobQueue import JobQueue, Job, JOB_DONE, JOB_FAILED
+from ai.models.LLMProvider import LLMProvider
+from ai.models.novel.Schema import loadNovelSpec
+from ai.tracing.Tracer import tracer, format_duration
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def find_specs(patterns: List[str]) -> List[str]:
+    """NovelSpec YAML files from directories (all *.yml/*.yaml in them) and glob patterns"""
+    specs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.yml")) + glob.glob(os.path.join(pattern, "*.yaml"))
+        else:
+            matches = glob.glob(pattern)
+        specs.extend(sorted(os.path.abspath(match) for match in matches))
+    return list(dict.fromkeys(specs))
+
+
+def write_novel(modelStore: str, chapters: List[str]) -> str:
+    """Write chapters to novel.md in the model store, shared by main.py, the batch runner and the UI"""
+    novel_content = ''
+    for index, chapter in enumerate(chapters):
+        novel_content += f"\n--- Chapter {index + 1} ---\n"
+        novel_content += chapter
+    path = os.path.join(modelStore, "novel.md")
+    with open(path, "w") as f:
+        f.write(novel_content)
+    return path
+
+
+class BatchRunner:
+    """Generates every (spec, model) pair of a batch in one process.
+
+    Jobs live in a JobQueue so an interrupted batch continues where it stopped,
+    and each job runs with resume=True so its finished stages are not generated
+    again. At most maxWorkers jobs run at once, and at most modelLimits[model]
+    (default perModelLimit) of them on the same model. Output goes to
+    contents/<model>/<spec name>/ next to the single spec layout of main.py.
+    """
+    def __init__(self, queue: JobQueue, base_url: str = "http://localhost:11434", maxWorkers: int = 2,
+                 perModelLimit: int = 1, modelLimits: Optional[Dict[str, int]] = None, useCache: bool = True,
+                 chunkPages: int = None):
+        self.queue = queue
+        self.base_url = base_url
+        self.maxWorkers = max(1, maxWorkers)
+        self.perModelLimit = max(1, perModelLimit)
+        self.modelLimits = modelLimits or {}
+        self.useCache = useCache
+        self.chunkPages = chunkPages
+        self._running: Dict[str, int] = {}
+        self._changed: asyncio.Condition = None
+
+    def enqueue(self, specPaths: List[str], models: List[str], retryFailed: bool = False):
+        for specPath in specPaths:
+            specHash = RunManifest.spec_hash(loadNovelSpec(specPath))
+            for model in models:
+                self.queue.enqueue(specPath, specHash, model, retryFailed)
+
+    def model_limit(self, model: str) -> int:
+        return self.modelLimits.get(model, self.perModelLimit)
+
+    def saturated_models(self) -> List[str]:
+        return [model for model, running in self._running.items() if running >= self.model_limit(model)]
+
+    def claim(self) -> Optional[Job]:
+        loaded = [model for model, running in self._running.items() if running]
+        return self.queue.claim(self.saturated_models(), preferModels=loaded)
+
+    async def run(self) -> Dict[str, int]:
+        """Work through the queue until no job is pending or running, returns job counts per status"""
+        self._changed = asyncio.Condition()
+        await asyncio.gather(*(self.worker() for _ in range(self.maxWorkers)))
+        return self.queue.counts()
+
+    async def worker(self):
+        while True:
+            async with self._changed:
+                job = self.claim()
+                while job is None:
+                    if not any(self._running.values()):
+                        return
+                    await self._changed.wait()
+                    job = self.claim()
+                self._running[job.model] = self._running.get(job.model, 0) + 1
+            try:
+                await self.run_job(job)
+            finally:
+                async with self._changed:
+                    self._running[job.model] -= 1
+                    self._changed.notify_all()
+
+    async def run_job(self, job: Job):
+        specName = LLMProvider.sanitize_folder_name(os.path.splitext(os.path.basename(job.specPath))[0])
+        logger.info(f"Job {job.id}: {specName} on {job.model}, attempt {job.attempts}")
+        with tracer.span("batch_job", "job", spec=specName, model=job.model, attempt=job.attempts) as span:
+            try:
+                novelSpec = loadNovelSpec(job.specPath)
+                llmConfig = LLMProvider.create_llm_config(base_url=self.base_url, model=job.model, useCache=self.useCache)
+                llmConfig.modelStore = os.path.join(llmConfig.modelStore, specName)
+                os.makedirs(llmConfig.modelStore, exist_ok=True)
+                novelWriter = NovelWriter(llmConfig, chunkPages=self.chunkPages)
+                try:
+                    chapters = await novelWriter.generateNovel(novelSpec, resume=True)
+                finally:
+                    # Keep the model loaded for the next job of the same model, unload it after the last one
+                    novelWriter.close(llmConfig.keepAlive if self.queue.pending(job.model) else 0)
+                if not chapters or any(chapter.startswith("Error generating chapter") for chapter in chapters):
+                    raise RuntimeError("novel generation did not complete")
+                output = write_novel(llmConfig.modelStore, chapters)
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}")
+                span.status = "error"
+                span.error = str(e)
+                self.queue.fail(job, str(e))
+                return
+        self.queue.complete(job, output)
+        logger.info(f"Job {job.id} done in {format_duration(span.durationMs / 1000)}, wrote {output}")
+
+
+def summarize(queue: JobQueue) -> str:
+    lines = []
+    for job in queue.jobs():
+        detail = job.output if job.status == JOB_DONE else (job.error if job.status == JOB_FAILED else "")
+        lines.append(f"{job.status:8s} {job.model:40s} {os.path.basename(job.specPath):30s} {detail or ''}")
+    return "\n".join(lines)
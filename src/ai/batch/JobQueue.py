@@ -0,0 +1,126 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: int
+    specPath: str
+    specHash: str
+    model: str
+    status: str = JOB_PENDING
+    attempts: int = 0
+    error: Optional[str] = None
+    output: Optional[str] = None
+
+
+class JobQueue:
+    """SQLite backed queue of (spec, model) novel jobs that survives restarts.
+
+    A job is unique per spec file and model. Re-enqueueing a finished job is a
+    no-op unless the spec changed, and jobs left running by a crashed process
+    go back to pending when the queue is opened again.
+    """
+    def __init__(self, path: str, maxAttempts: int = 2):
+        self.path = path
+        self.maxAttempts = maxAttempts
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                spec_path TEXT NOT NULL,
+                spec_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                output TEXT,
+                updated REAL NOT NULL,
+                UNIQUE(spec_path, model)
+            )
+        """)
+        recovered = self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE status = ?",
+                                     (JOB_PENDING, time.time(), JOB_RUNNING)).rowcount
+        if recovered:
+            logger.info(f"Requeued {recovered} jobs left running by a previous batch.")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def enqueue(self, specPath: str, specHash: str, model: str, retryFailed: bool = False):
+        """Add a job, resetting it to pending when its spec changed (or it failed and retryFailed)"""
+        with self._lock:
+            row = self._db.execute("SELECT spec_hash, status FROM jobs WHERE spec_path = ? AND model = ?",
+                                   (specPath, model)).fetchone()
+            if row is None:
+                self._db.execute("INSERT INTO jobs (spec_path, spec_hash, model, status, updated) VALUES (?, ?, ?, ?, ?)",
+                                 (specPath, specHash, model, JOB_PENDING, time.time()))
+            elif row[0] != specHash or (retryFailed and row[1] == JOB_FAILED):
+                self._db.execute("UPDATE jobs SET spec_hash = ?, status = ?, attempts = 0, error = NULL, updated = ? "
+                                 "WHERE spec_path = ? AND model = ?",
+                                 (specHash, JOB_PENDING, time.time(), specPath, model))
+
+    def claim(self, excludeModels: List[str] = (), preferModels: List[str] = ()) -> Optional[Job]:
+        """Mark a pending job whose model is not excluded as running and return it.
+
+        Jobs of preferModels (the models already loaded) come first, then jobs
+        grouped by model, so a batch loads each model once instead of alternating.
+        """
+        query = "SELECT id, spec_path, spec_hash, model, status, attempts, error, output FROM jobs WHERE status = ?"
+        if excludeModels:
+            query += f" AND model NOT IN ({','.join('?' for _ in excludeModels)})"
+        query += f" ORDER BY CASE WHEN model IN ({','.join('?' for _ in preferModels)}) THEN 0 ELSE 1 END, model, id LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, (JOB_PENDING, *excludeModels, *preferModels)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                             (JOB_RUNNING, time.time(), row[0]))
+        job = Job(*row)
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        return job
+
+    def complete(self, job: Job, output: str):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, output = ?, error = NULL, updated = ? WHERE id = ?",
+                             (JOB_DONE, output, time.time(), job.id))
+
+    def fail(self, job: Job, error: str):
+        """Put the job back in the queue until it used up maxAttempts"""
+        status = JOB_PENDING if job.attempts < self.maxAttempts else JOB_FAILED
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                             (status, error, time.time(), job.id))
+
+    def pending(self, model: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND model = ?", (JOB_PENDING, model)).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            rows = self._db.execute("SELECT id, spec_path, spec_hash, model, status, attempts, error, output FROM jobs ORDER BY id").fetchall()
+        return [Job(*row) for row in rows]
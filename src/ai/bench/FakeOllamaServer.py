@@ -0,0 +1,212 @@
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NANOS = 1_000_000_000
+LOREM = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua."
+
+
+def sample_from_schema(schema: Dict[str, Any], arrayLength: int = 5) -> Any:
+    """Smallest value that satisfies a JSON schema, used to answer structured requests"""
+    if not isinstance(schema, dict):
+        return {}
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {name: sample_from_schema(prop, arrayLength) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        length = max(schema.get("minItems", 0), min(arrayLength, schema.get("maxItems", arrayLength)))
+        return [sample_from_schema(schema.get("items", {}), arrayLength) for _ in range(length)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    return LOREM.split(",")[0]
+
+
+class FakeOllamaServer:
+    """Minimal local stand-in for the Ollama HTTP API.
+
+    Serves /api/generate (streaming and not), /api/tags, /api/ps and /api/version
+    so EndpointPool routing, failover and the benchmark replay mode can be
+    exercised without a GPU. Answers come from `responder(request)` or, by
+    default, lorem text or a schema shaped JSON document. Every request is kept
+    in `requests`; set `failing` to make the node answer 503.
+    """
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 tokenDelay: float = 0.0, promptDelay: float = 0.0, wordsPerToken: int = 1, arrayLength: int = 5):
+        self.responder = responder or self.default_response
+        self.tokenDelay = tokenDelay
+        self.promptDelay = promptDelay
+        self.wordsPerToken = wordsPerToken
+        self.arrayLength = arrayLength
+        self.failing = False
+        self.requests: List[Dict[str, Any]] = []
+        self.loadedModels: List[str] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def default_response(self, request: Dict[str, Any]) -> str:
+        schema = request.get("format")
+        if isinstance(schema, dict):
+            return json.dumps(sample_from_schema(schema, self.arrayLength))
+        if schema == "json":
+            return "{}"
+        return LOREM
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Ollama server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def tokenize(self, text: str) -> List[str]:
+        words = text.split(" ")
+        tokens = []
+        for index in range(0, len(words), self.wordsPerToken):
+            token = " ".join(words[index:index + self.wordsPerToken])
+            tokens.append(token if index + self.wordsPerToken >= len(words) else token + " ")
+        return tokens
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Send streamed chunks immediately instead of waiting on delayed ACKs
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, payload: Dict[str, Any]):
+                line = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if server.failing:
+                    return self._send_json(503, {"error": "node unavailable"})
+                if self.path == "/api/version":
+                    return self._send_json(200, {"version": "0.0.0-fake"})
+                if self.path == "/api/tags":
+                    return self._send_json(200, {"models": [{"name": name, "model": name} for name in server.loadedModels]})
+                if self.path == "/api/ps":
+                    return self._send_json(200, {"models": [{"name": name, "model": name} for name in server.loadedModels]})
+                self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server.requests.append(request)
+                if server.failing:
+                    return self._send_json(503, {"error": "node unavailable"})
+                if self.path != "/api/generate":
+                    return self._send_json(404, {"error": "not found"})
+
+                model = request.get("model", "")
+                if request.get("keep_alive") == 0 and not request.get("prompt"):
+                    # Ollama unloads the model for an empty request with keep_alive 0
+                    if model in server.loadedModels:
+                        server.loadedModels.remove(model)
+                    return self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "unload"})
+                start = time.time()
+                loadDuration = 0
+                if model and model not in server.loadedModels:
+                    server.loadedModels.append(model)
+                    loadDuration = 1
+                time.sleep(server.promptDelay)
+                text = server.responder(request) if request.get("prompt") else ""
+                tokens = server.tokenize(text) if text else []
+                # Like Ollama, stop at num_predict and report it as done_reason "length"
+                numPredict = (request.get("options") or {}).get("num_predict") or -1
+                doneReason = "stop"
+                if 0 < numPredict < len(tokens):
+                    tokens, doneReason = tokens[:numPredict], "length"
+                    text = "".join(tokens)
+                promptTokens = len((request.get("system") or "") + (request.get("prompt") or "")) // 4
+
+                def final(evalStart: float) -> Dict[str, Any]:
+                    end = time.time()
+                    return {
+                        "model": model, "response": "", "done": True, "done_reason": doneReason,
+                        "context": [1, 2, 3],
+                        "total_duration": int((end - start) * NANOS),
+                        "load_duration": loadDuration,
+                        "prompt_eval_count": promptTokens,
+                        "prompt_eval_duration": int((evalStart - start) * NANOS),
+                        "eval_count": len(tokens),
+                        "eval_duration": max(1, int((end - evalStart) * NANOS)),
+                    }
+
+                if not request.get("stream", True):
+                    evalStart = time.time()
+                    time.sleep(server.tokenDelay * len(tokens))
+                    payload = final(evalStart)
+                    payload["response"] = text
+                    return self._send_json(200, payload)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                evalStart = time.time()
+                for token in tokens:
+                    time.sleep(server.tokenDelay)
+                    self._send_chunk({"model": model, "response": token, "done": False})
+                self._send_chunk(final(evalStart))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for local testing")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+    server = FakeOllamaServer(port=args.port, tokenDelay=args.token_delay).start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,228 @@
+import os
+import re
+import csv
+import json
+import time
+import logging
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, List, Optional
+from ai.agents.NovelWriter import NovelWriter
+from ai.models.LLMProvider import LLMProvider
+from ai.models.novel.Schema import NovelSpec, AgentResponse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TASK_OUTLINE = "plot outline"
+TASK_CHARACTERS = "character develop"
+TASK_CHAPTER_PLOT = "chapter plot"
+TASK_CHAPTER_WRITE = "chapter write"
+TASK_CHAPTER_EDIT = "chapter edit"
+
+ROLE_PATTERN = re.compile(r"^Role: (\S+)$", re.MULTILINE)
+
+
+@dataclass
+class BenchResult:
+    model: str
+    task: str
+    chapter: Optional[int] = None
+    latencyMs: Optional[float] = None
+    ttftMs: Optional[float] = None
+    tokensPerSec: Optional[float] = None
+    promptEvalCount: Optional[int] = None
+    evalCount: Optional[int] = None
+    loadDurationMs: Optional[float] = None
+    promptEvalDurationMs: Optional[float] = None
+    evalDurationMs: Optional[float] = None
+    serverTotalMs: Optional[float] = None
+    overheadMs: Optional[float] = None
+    outputChars: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return self.task if self.chapter is None else f"{self.task} ({self.chapter})"
+
+
+class Recording:
+    """Responses per (model, agent role) in call order, replayed by the fake backend.
+
+    The benchmark runs stages in a fixed order, so the n-th call a role makes in
+    replay gets the n-th response that role produced while recording.
+    """
+    def __init__(self, responses: Dict[str, Dict[str, List[str]]] = None):
+        self.responses = responses or {}
+        self._cursor: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.responses, f, indent=4)
+
+    def add(self, model: str, role: str, response: AgentResponse):
+        content = response.content if isinstance(response.content, str) else json.dumps(response.content)
+        self.responses.setdefault(model, {}).setdefault(role, []).append(content)
+
+    def next(self, model: str, role: str) -> Optional[str]:
+        recorded = self.responses.get(model, {}).get(role, [])
+        key = f"{model}|{role}"
+        index = self._cursor.get(key, 0)
+        if index >= len(recorded):
+            return None
+        self._cursor[key] = index + 1
+        return recorded[index]
+
+    def responder(self, fallback):
+        """FakeOllamaServer responder replaying this recording, fallback for unrecorded calls"""
+        def respond(request: Dict[str, Any]) -> str:
+            match = ROLE_PATTERN.search(request.get("system") or request.get("prompt", ""))
+            recorded = self.next(request.get("model", ""), match.group(1)) if match else None
+            return recorded if recorded is not None else fallback(request)
+        return respond
+
+
+class NovelBenchmark:
+    """Runs a fixed NovelSpec through each NovelWriter stage for a list of models
+    and records per stage latency, time to first token, throughput and token counts"""
+    def __init__(self, novelSpec: NovelSpec, models: List[str], base_url: str = "http://localhost:11434",
+                 chapters: int = 1, recording: Optional[Recording] = None):
+        self.novelSpec = novelSpec
+        self.models = models
+        self.base_url = base_url
+        self.chapters = chapters
+        self.recording = recording
+
+    def _result(self, model: str, task: str, response: AgentResponse, latencyMs: float, chapter: int = None) -> BenchResult:
+        stats = (response.metadata or {}).get("stats", {})
+        result = BenchResult(model=model, task=task, chapter=chapter, latencyMs=latencyMs)
+        for field in fields(BenchResult):
+            if field.name in stats and field.name != "latencyMs":
+                setattr(result, field.name, stats[field.name])
+        if result.serverTotalMs is not None:
+            result.overheadMs = latencyMs - result.serverTotalMs
+        if self.recording is not None:
+            self.recording.add(model, response.metadata.get("role"), response)
+        logger.info(f"[bench] {model} {result.label}: {latencyMs:.2f}ms")
+        return result
+
+    async def _timed(self, stage):
+        start_time = time.time()
+        response = await stage
+        return response, (time.time() - start_time) * 1000
+
+    async def run_model(self, model: str) -> List[BenchResult]:
+        llmConfig = LLMProvider.create_llm_config(base_url=self.base_url, model=model, useCache=False)
+        novelWriter = NovelWriter(llmConfig, maxConcurrentChapters=1, preloadModels=False)
+        results: List[BenchResult] = []
+        try:
+            plotOutline, latency = await self._timed(novelWriter.createNovelOutline(self.novelSpec))
+            results.append(self._result(model, TASK_OUTLINE, plotOutline, latency))
+            characterProfiles, latency = await self._timed(novelWriter.createCharacterProfiles(self.novelSpec, plotOutline))
+            results.append(self._result(model, TASK_CHARACTERS, characterProfiles, latency))
+
+            context = novelWriter.build_context(self.novelSpec, plotOutline, characterProfiles)
+            for chapterSpec in novelWriter.build_chapter_specs(self.novelSpec, context)[:self.chapters]:
+                number = chapterSpec.chapterNumber
+                chapterPlot, latency = await self._timed(novelWriter.createChapterPlot(chapterSpec, self.novelSpec, context))
+                results.append(self._result(model, TASK_CHAPTER_PLOT, chapterPlot, latency, number))
+                draft, latency = await self._timed(novelWriter.writeChapter(chapterSpec, self.novelSpec, novelWriter.build_chapter_context(chapterPlot, context)))
+                results.append(self._result(model, TASK_CHAPTER_WRITE, draft, latency, number))
+                edited, latency = await self._timed(novelWriter.editChapter(chapterSpec, draft))
+                results.append(self._result(model, TASK_CHAPTER_EDIT, edited, latency, number))
+        except Exception as e:
+            logger.error(f"[bench] {model} failed: {e}")
+            results.append(BenchResult(model=model, task="error", error=str(e)))
+        return results
+
+    async def run(self) -> List[BenchResult]:
+        results: List[BenchResult] = []
+        for model in self.models:
+            results.extend(await self.run_model(model))
+        return results
+
+
+def write_json(results: List[BenchResult], path: str):
+    with open(path, 'w') as f:
+        json.dump([asdict(result) for result in results], f, indent=4)
+
+
+def write_csv(results: List[BenchResult], path: str):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(BenchResult)])
+        writer.writeheader()
+        for result in results:
+            writer.writerow(asdict(result))
+
+
+def _table_rows(path: str) -> List[List[str]]:
+    """Cells of the data rows of an existing performance.md table, in file order"""
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, 'r') as f:
+        for line in f:
+            cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            if line.strip().startswith("|") and len(cells) >= 3 and cells[0] not in ("Model", "") and not cells[0].startswith((":", "-")):
+                rows.append(cells)
+    return rows
+
+
+def load_qualities(path: str) -> Dict[tuple, str]:
+    """Quality ratings (model, task label) -> Good/Bad from an existing performance.md table"""
+    return {(cells[0], cells[1]): cells[2] for cells in _table_rows(path)}
+
+
+def load_model_rows(path: str) -> Dict[str, List[str]]:
+    """Rows of an existing performance.md table per model, in file order, kept verbatim"""
+    rows: Dict[str, List[str]] = {}
+    for cells in _table_rows(path):
+        rows.setdefault(cells[0], []).append(f"| {' | '.join(cells)} |")
+    return rows
+
+
+def _format(value: Any, suffix: str = "") -> str:
+    if value is None:
+        return "n/a"
+    if isinstance(value, float):
+        return f"{value:.2f}{suffix}"
+    return f"{value}{suffix}"
+
+
+def to_markdown(results: List[BenchResult], qualities: Dict[tuple, str] = None, previousRows: Dict[str, List[str]] = None) -> str:
+    """Render results in the performance.md table layout, one block per model.
+
+    previousRows (see load_model_rows) keeps the rows of models that were not
+    run this time, in their original place, new models are added at the end.
+    """
+    qualities = qualities or {}
+    blocks: Dict[str, List[str]] = dict(previousRows or {})
+    for model in dict.fromkeys(result.model for result in results):
+        blocks[model] = []
+    for result in results:
+        if result.error:
+            blocks[result.model].append(f"| {result.model} | {result.task} | n/a | {result.error} | | | | | | |")
+            continue
+        # Rows written before chapter numbers were added to the label are rated per task
+        quality = qualities.get((result.model, result.label), qualities.get((result.model, result.task), "n/a"))
+        blocks[result.model].append(
+            f"| {result.model} | {result.label} | {quality} | {_format(result.latencyMs, 'ms')} | {_format(result.ttftMs, 'ms')} "
+            f"| {_format(result.tokensPerSec)} | {_format(result.promptEvalCount)} | {_format(result.evalCount)} "
+            f"| {_format(result.loadDurationMs, 'ms')} | {_format(result.outputChars)} |"
+        )
+    lines = [
+        "### Model performance and generation time",
+        "",
+        "| Model | Task | Quality | Time | TTFT | Tokens/sec | Prompt tokens | Eval tokens | Load | Output chars |",
+        "| :---- | :---- | :---: | :--- | :--- | :--- | :--- | :--- | :--- | :--- |",
+    ]
+    for index, rows in enumerate(blocks.values()):
+        if index > 0:
+            lines.append("|------|-----|-----|-----|-----|-----|-----|-----|-----|-----|")
+        lines.extend(rows)
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import List, Optional
 from .OpenAIConfig import OpenAIConfig
 
 class LLMConfig:
@@ -6,11 +7,36 @@ class LLMConfig:
     model: str = "phi4"
     openAIConfig: OpenAIConfig = OpenAIConfig()
     modelStore: str = 'x'
-    def __init__(self, base_url: str, model: str, openAIConfig: OpenAIConfig, modelStore: str = 'x'):
+    maxConnections: int = 8
+    useCache: bool = False
+    cacheDir: Optional[str] = None
+    cacheMaxBytes: int = 256 * 1024 * 1024
+    base_urls: Optional[List[str]] = None
+    routing: str = "least_outstanding"
+    keepAlive: Optional[str] = None
+    maxContext: int = 16384
+    def __init__(self, base_url: str, model: str, openAIConfig: OpenAIConfig, modelStore: str = 'x', maxConnections: int = 8,
+                 useCache: bool = False, cacheDir: Optional[str] = None, cacheMaxBytes: int = 256 * 1024 * 1024,
+                 base_urls: Optional[List[str]] = None, routing: str = "least_outstanding", keepAlive: Optional[str] = None,
+                 maxContext: int = 16384):
         self.model = model
         self.modelStore = modelStore
         self.base_url = base_url
+        self.maxConnections = maxConnections
+        self.useCache = useCache
+        self.cacheDir = cacheDir
+        self.cacheMaxBytes = cacheMaxBytes
+        self.base_urls = base_urls
+        self.routing = routing
+        # How long Ollama keeps the model (and its prompt cache) loaded, None uses the server default
+        self.keepAlive = keepAlive
+        # Largest num_ctx requests may use, the model's trained context or what fits in VRAM
+        self.maxContext = maxContext
         if openAIConfig is None:
             self.openAIConfig = OpenAIConfig()
         else:
             self.openAIConfig = openAIConfig
+
+    def endpoints(self) -> List[str]:
+        """Ollama nodes to dispatch to, base_urls when a pool is configured"""
+        return list(self.base_urls) if self.base_urls else [self.base_url]
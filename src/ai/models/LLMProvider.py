@@ -1,6 +1,6 @@
 
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from ai.models.OpenAIConfig import OpenAIConfig
 from ai.models.LLMConfig import LLMConfig
 from ai.models.SafetyConfig import SafetyConfig
@@ -80,7 +80,18 @@ class LLMProvider:
         
         return sanitized
     @staticmethod
-    def create_llm_config(base_url="http://localhost:11434", model = "phi4", openAIConfig = None) -> LLMConfig:
+    def create_llm_config(base_url="http://localhost:11434", model = "phi4", openAIConfig = None, maxConnections: int = 8,
+                          useCache: bool = True, cacheDir: str = os.path.join("contents", ".cache"),
+                          base_urls: Optional[List[str]] = None, routing: str = "least_outstanding",
+                          keepAlive: Optional[str] = "30m", maxContext: int = 16384) -> LLMConfig:
+        """Create an LLMConfig storing output under contents/<model>.
+
+        Pass base_urls to spread calls over several Ollama nodes, routed with
+        "least_outstanding" or "model_affinity" (see ai.backend.EndpointPool).
+        keepAlive keeps the model resident between stages so the prompt cache
+        for the shared system prompt and novel prefix survives. maxContext caps
+        the num_ctx sized per request (see ai.agents.TokenBudget).
+        """
         storageFolder = LLMProvider.sanitize_folder_name(model)
         storagePath = os.path.join("contents", storageFolder)
         os.makedirs(storagePath, exist_ok=True)
@@ -91,6 +102,13 @@ class LLMProvider:
             base_url=base_url,
             model=model,
             openAIConfig=openAIConfig,
-            modelStore=storagePath
+            modelStore=storagePath,
+            maxConnections=maxConnections,
+            useCache=useCache,
+            cacheDir=cacheDir,
+            base_urls=base_urls,
+            routing=routing,
+            keepAlive=keepAlive,
+            maxContext=maxContext
         )
 
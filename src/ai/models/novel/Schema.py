@@ -91,6 +91,22 @@ class NovelSpec:
                 keyEvents=keyEvents
             )
 
+@dataclass
+class GenerationStats:
+    """Timings and token counts for a single LLM call, durations in milliseconds"""
+    totalMs: float = 0.0
+    ttftMs: Optional[float] = None
+    tokensPerSec: Optional[float] = None
+    promptEvalCount: Optional[int] = None
+    evalCount: Optional[int] = None
+    loadDurationMs: Optional[float] = None
+    promptEvalDurationMs: Optional[float] = None
+    evalDurationMs: Optional[float] = None
+    serverTotalMs: Optional[float] = None
+    outputChars: int = 0
+    # Why Ollama stopped: "stop" when the model finished, "length" when it hit num_predict or the context
+    doneReason: Optional[str] = None
+
 @dataclass
 class AgentResponse:
     content: Optional[Union[str, Dict[str, Any]]] = None
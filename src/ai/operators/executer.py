@@ -1,37 +1,224 @@
-import subprocess
+import shlex
+import asyncio
+from typing import Callable, Dict, List, Optional
 
-def execute_shell_command(command, command_args):
-    argsCommand = []
-    argsCommand.append(command)
+ALLOWED_COMMANDS = ["ls", "du", "df", "whoami", "pwd"]
 
-    if command_args:
-        argsCommand.extend(command_args.split(" "))
-    
-    print(argsCommand)
+# Limits per command, a `du` over a large tree must not hang the agent or fill its memory
+DEFAULT_TIMEOUT = 30.0
+MAX_OUTPUT_BYTES = 64 * 1024
+CHUNK_SIZE = 4096
+MAX_CONCURRENT_COMMANDS = 4
+
+
+class OutputBuffer:
+    """Keeps the first maxBytes of a stream and counts what was dropped"""
+    def __init__(self, maxBytes: int):
+        self.maxBytes = maxBytes
+        self.data = bytearray()
+        self.dropped = 0
+
+    def append(self, chunk: bytes):
+        room = max(0, self.maxBytes - len(self.data))
+        self.data += chunk[:room]
+        self.dropped += len(chunk) - min(room, len(chunk))
+
+    def text(self) -> str:
+        text = self.data.decode(errors="replace").strip()
+        if self.dropped:
+            text += f"\n... [{self.dropped} bytes truncated]"
+        return text
+
+
+def parse_command(command: str, command_args: str = "") -> Optional[List[str]]:
+    """argv for an allowed command, None when it is not allowed or does not parse"""
     try:
-        result = subprocess.run(
-            argsCommand, shell=False, text=True, capture_output=True
+        argv = shlex.split(command or "") + shlex.split(command_args or "")
+    except ValueError:
+        return None
+    if not argv or argv[0] not in ALLOWED_COMMANDS:
+        return None
+    return argv
+
+
+async def _pump(stream: asyncio.StreamReader, buffer: OutputBuffer, name: str, onChunk: Optional[Callable[[str, str], None]]):
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer.append(chunk)
+        if onChunk is not None:
+            onChunk(name, chunk.decode(errors="replace"))
+
+
+async def aexecute_shell_command(command, command_args, timeout: float = DEFAULT_TIMEOUT, maxOutputBytes: int = MAX_OUTPUT_BYTES,
+                                 onChunk: Optional[Callable[[str, str], None]] = None):
+    """Run an allowed command without a shell, killing it after timeout seconds.
+
+    stdout and stderr are read in CHUNK_SIZE chunks, passed to onChunk(stream, text)
+    as they arrive and kept up to maxOutputBytes each.
+    """
+    argv = parse_command(command, command_args)
+    if argv is None:
+        return {"error": "Command not allowed"}
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
         )
-        return {
-            "stdout": result.stdout.strip(),
-            "stderr": result.stderr.strip(),
-            "returncode": result.returncode,
-        }
-    except Exception as e:
+    except OSError as e:
         return {"error": str(e)}
 
-def process_command(llm_output):
+    stdout, stderr = OutputBuffer(maxOutputBytes), OutputBuffer(maxOutputBytes)
+    # The pumps keep draining after a kill, wait() only returns once both pipes are closed
+    pumps = [
+        asyncio.ensure_future(_pump(process.stdout, stdout, "stdout", onChunk)),
+        asyncio.ensure_future(_pump(process.stderr, stderr, "stderr", onChunk)),
+    ]
+    timedOut = False
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        timedOut = True
+        process.kill()
+        await process.wait()
+    await asyncio.gather(*pumps)
+    result = {
+        "stdout": stdout.text(),
+        "stderr": stderr.text(),
+        "returncode": process.returncode,
+    }
+    if timedOut:
+        result["error"] = f"Command timed out after {timeout:g}s"
+    if stdout.dropped or stderr.dropped:
+        result["truncated"] = True
+    return result
+
+
+def labelled(onChunk: Optional[Callable[[str, str], None]], label: str) -> Optional[Callable[[str, str], None]]:
+    """onChunk reporting streams as "<label>/<stream>", so output of concurrent steps can be told apart"""
+    if onChunk is None:
+        return None
+    return lambda stream, text: onChunk(f"{label}/{stream}", text)
+
+
+def execute_shell_command(command, command_args, timeout: float = DEFAULT_TIMEOUT):
+    """Blocking variant of aexecute_shell_command, not for use inside a running event loop"""
+    return asyncio.run(aexecute_shell_command(command, command_args, timeout))
+
+
+async def aprocess_command(llm_output, timeout: float = DEFAULT_TIMEOUT, onChunk: Optional[Callable[[str, str], None]] = None):
+    """Execute one action, a {"steps": [...]} plan, or every action of an {"actions": [...]} response concurrently.
+
+    Output is passed to onChunk(stream, text) while the commands run, streams of
+    plan steps are named "<step id>/stdout", those of actions "<position>/stdout".
+    """
+    if isinstance(llm_output.get("steps"), list):
+        return await aexecute_plan(llm_output["steps"], timeout, onChunk=onChunk)
+    if isinstance(llm_output.get("actions"), list):
+        return await aprocess_commands(llm_output["actions"], timeout, onChunk=onChunk)
     if llm_output.get("action") == "run_shell_command":
         command = llm_output.get("command")
         command_args = llm_output.get("command_args", "")
         if validate_command(command):
-            return execute_shell_command(command, command_args)
+            return await aexecute_shell_command(command, command_args, timeout, onChunk=onChunk)
         else:
             return {"error": "Command not allowed"}
     return {"error": "Unsupported action"}
 
-def validate_command(command):
-    ALLOWED_COMMANDS = ["ls", "du", "df", "whoami", "pwd"]
-    command_name = command.split()[0]
-    return command_name in ALLOWED_COMMANDS
 
+async def aprocess_commands(actions: List[Dict], timeout: float = DEFAULT_TIMEOUT, maxConcurrent: int = MAX_CONCURRENT_COMMANDS,
+                            onChunk: Optional[Callable[[str, str], None]] = None) -> List[Dict]:
+    """Execute validated actions concurrently, results in the order of actions"""
+    semaphore = asyncio.Semaphore(maxConcurrent)
+
+    async def run(index: int, action: Dict) -> Dict:
+        async with semaphore:
+            return await aprocess_command(action, timeout, labelled(onChunk, str(index + 1)))
+
+    return await asyncio.gather(*(run(index, action) for index, action in enumerate(actions)))
+
+
+def step_ids(steps: List[Dict]) -> List[str]:
+    """Step ids as strings, numbered by position when missing and made unique when repeated"""
+    ids = []
+    for index, step in enumerate(steps):
+        stepId = str(step.get("id") or index + 1)
+        ids.append(stepId if stepId not in ids else f"{stepId}#{index + 1}")
+    return ids
+
+
+def invalid_steps(steps: List[Dict]) -> Dict[str, str]:
+    """Steps that can never run, with the reason: unknown dependencies or a dependency cycle"""
+    ids = step_ids(steps)
+    dependencies = {stepId: [str(dep) for dep in step.get("depends_on") or []] for stepId, step in zip(ids, steps)}
+    invalid = {}
+    for stepId, deps in dependencies.items():
+        unknown = [dep for dep in deps if dep not in dependencies]
+        if unknown:
+            invalid[stepId] = f"Unknown dependency {', '.join(unknown)}"
+    # Kahn's algorithm, whatever is left unordered sits on a cycle
+    remaining = {stepId: set(deps) & set(dependencies) for stepId, deps in dependencies.items()}
+    ready = [stepId for stepId, deps in remaining.items() if not deps]
+    while ready:
+        done = ready.pop()
+        remaining.pop(done)
+        for stepId, deps in remaining.items():
+            if done in deps:
+                deps.discard(done)
+                if not deps:
+                    ready.append(stepId)
+    for stepId in remaining:
+        invalid.setdefault(stepId, "Dependency cycle")
+    return invalid
+
+
+def failed(result: Dict) -> bool:
+    return "error" in result or bool(result.get("returncode"))
+
+
+async def aexecute_plan(steps: List[Dict], timeout: float = DEFAULT_TIMEOUT, maxConcurrent: int = MAX_CONCURRENT_COMMANDS,
+                        onChunk: Optional[Callable[[str, str], None]] = None) -> Dict[str, Dict]:
+    """Execute plan steps as a DAG: a step starts as soon as the steps in its depends_on
+    succeeded, independent steps run concurrently. Returns results by step id."""
+    ids = step_ids(steps)
+    invalid = invalid_steps(steps)
+    semaphore = asyncio.Semaphore(maxConcurrent)
+    loop = asyncio.get_running_loop()
+    futures = {stepId: loop.create_future() for stepId in ids}
+
+    async def run(stepId: str, step: Dict):
+        result = {"error": "Step did not finish"}
+        try:
+            if stepId in invalid:
+                result = {"error": invalid[stepId]}
+            else:
+                result = None
+                for dep in step.get("depends_on") or []:
+                    if failed(await futures[str(dep)]):
+                        result = {"error": f"Skipped, step {dep} failed"}
+                        break
+                if result is None:
+                    async with semaphore:
+                        result = await aprocess_command(step, timeout, labelled(onChunk, stepId))
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            # Always resolve, steps depending on this one are waiting on it
+            if not futures[stepId].done():
+                futures[stepId].set_result(result)
+
+    await asyncio.gather(*(run(stepId, step) for stepId, step in zip(ids, steps)))
+    return {stepId: futures[stepId].result() for stepId in ids}
+
+
+def process_command(llm_output):
+    """Blocking variant of aprocess_command, not for use inside a running event loop"""
+    return asyncio.run(aprocess_command(llm_output))
+
+
+def validate_command(command):
+    try:
+        argv = shlex.split(command or "")
+    except ValueError:
+        return False
+    return bool(argv) and argv[0] in ALLOWED_COMMANDS
@@ -0,0 +1,198 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from aiohttp import web
+from ai.agents.SystemAgent import SystemAgent
+from ai.operators.executer import aprocess_command, DEFAULT_TIMEOUT
+from ai.tracing.Tracer import tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+@dataclass
+class Session:
+    id: str
+    createdAt: float = field(default_factory=time.time)
+    lastUsed: float = field(default_factory=time.time)
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    # Prompts of one session run in order, different sessions run concurrently
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def info(self) -> Dict[str, Any]:
+        return {"id": self.id, "createdAt": self.createdAt, "lastUsed": self.lastUsed, "requests": len(self.history)}
+
+
+class SessionServer:
+    """Long running HTTP (or unix socket) front end for one warm SystemAgent.
+
+    The agent, its pooled Ollama connections and its pinned model are shared by
+    every client, so a command costs a request instead of a Python start and a
+    model load. Each session keeps its own history of prompts, results and
+    timings. At most maxSessions are kept, the least recently used goes first.
+
+        POST   /sessions                  new session
+        GET    /sessions/{id}             session info and history
+        DELETE /sessions/{id}             drop a session
+        POST   /sessions/{id}/commands    {"prompt": "..."} resolve and run a command, with ?stream=1
+                                          the output streams as NDJSON {"stream", "text"} lines
+                                          followed by the result line
+        GET    /health                    model, sessions and requests in flight
+    """
+    def __init__(self, systemAgent: SystemAgent, maxSessions: int = 256, historyLimit: int = 100, timeout: float = DEFAULT_TIMEOUT):
+        self.systemAgent = systemAgent
+        self.maxSessions = maxSessions
+        self.historyLimit = historyLimit
+        self.timeout = timeout
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.inFlight = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/health", self.health),
+            web.post("/sessions", self.create_session),
+            web.get("/sessions/{id}", self.get_session),
+            web.delete("/sessions/{id}", self.delete_session),
+            web.post("/sessions/{id}/commands", self.run_command),
+        ])
+        return app
+
+    def new_session(self) -> Session:
+        session = Session(id=uuid.uuid4().hex)
+        self.sessions[session.id] = session
+        while len(self.sessions) > self.maxSessions:
+            evicted, _ = self.sessions.popitem(last=False)
+            logger.info(f"Dropped least recently used session {evicted}")
+        return session
+
+    def session(self, request: web.Request) -> Session:
+        session = self.sessions.get(request.match_info["id"])
+        if session is None:
+            raise web.HTTPNotFound(text=f"Unknown session {request.match_info['id']}")
+        self.sessions.move_to_end(session.id)
+        session.lastUsed = time.time()
+        return session
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "model": self.systemAgent.llmConfig.model,
+                                  "sessions": len(self.sessions), "inFlight": self.inFlight})
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        return web.json_response(self.new_session().info(), status=201)
+
+    async def get_session(self, request: web.Request) -> web.Response:
+        session = self.session(request)
+        return web.json_response({**session.info(), "history": session.history}, dumps=dumps)
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session = self.session(request)
+        self.sessions.pop(session.id, None)
+        return web.json_response({"id": session.id, "deleted": True})
+
+    async def run_command(self, request: web.Request) -> web.Response:
+        session = self.session(request)
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        prompt = (body.get("prompt") or "").strip() if isinstance(body, dict) else ""
+        if not prompt:
+            raise web.HTTPBadRequest(text="Missing prompt")
+        if request.query.get("stream", "0") not in ("0", "false", ""):
+            return await self.stream_command(request, session, prompt)
+        async with session.lock:
+            entry = await self.process(prompt)
+            self.record(session, entry)
+        return web.json_response({"session": session.id, **entry}, dumps=dumps)
+
+    async def stream_command(self, request: web.Request, session: Session, prompt: str) -> web.StreamResponse:
+        """Run a command, writing its output as NDJSON lines while it runs and the result last"""
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        async def forward():
+            connected = True
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    return connected
+                if connected:
+                    try:
+                        await response.write((dumps({"stream": chunk[0], "text": chunk[1]}) + "\n").encode("utf-8"))
+                    except ConnectionError:
+                        # The command still runs to completion and lands in the history
+                        connected = False
+
+        forwarder = asyncio.ensure_future(forward())
+        try:
+            async with session.lock:
+                entry = await self.process(prompt, onChunk=lambda stream, text: chunks.put_nowait((stream, text)))
+                self.record(session, entry)
+        finally:
+            chunks.put_nowait(None)
+            connected = await forwarder
+        if connected:
+            await response.write((dumps({"session": session.id, **entry}) + "\n").encode("utf-8"))
+            await response.write_eof()
+        return response
+
+    def record(self, session: Session, entry: Dict[str, Any]):
+        session.history.append(entry)
+        del session.history[:-self.historyLimit]
+
+    async def process(self, prompt: str, onChunk: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Resolve, execute and (for plans) summarize one prompt, timing each phase"""
+        timing: Dict[str, float] = {}
+        entry: Dict[str, Any] = {"prompt": prompt, "startedAt": time.time(), "timing": timing}
+        start = time.perf_counter()
+        self.inFlight += 1
+        try:
+            with tracer.span("system_command", "request", model=self.systemAgent.llmConfig.model) as span:
+                phase = time.perf_counter()
+                response = await self.systemAgent.aresolve(prompt)
+                timing["resolveMs"] = elapsed_ms(phase)
+                entry.update(action=response.content, route=response.metadata.get("route"))
+                span.set(route=entry["route"])
+
+                phase = time.perf_counter()
+                entry["result"] = await aprocess_command(response.content, self.timeout, onChunk)
+                timing["executeMs"] = elapsed_ms(phase)
+
+                if isinstance(response.content, dict) and response.content.get("steps"):
+                    phase = time.perf_counter()
+                    summary = await self.systemAgent.asummarize(prompt, response.content, entry["result"])
+                    entry["summary"] = summary.content
+                    timing["summaryMs"] = elapsed_ms(phase)
+        except Exception as e:
+            logger.error(f"Failed to process '{prompt}': {str(e)}")
+            entry["error"] = str(e)
+        finally:
+            self.inFlight -= 1
+        timing["totalMs"] = elapsed_ms(start)
+        return entry
+
+
+async def serve(server: SessionServer, host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None) -> web.AppRunner:
+    """Start serving on a unix socket when path is given, otherwise on host:port"""
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.UnixSite(runner, path) if path else web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Session server for {server.systemAgent.llmConfig.model} listening on {path or f'http://{host}:{port}'}")
+    return runner
@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from ai.tracing.Tracer import Span, SpanExporter, KIND_LLM, tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class JsonlExporter(SpanExporter):
+    """Appends one JSON line per finished span"""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def on_end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter(SpanExporter):
+    """Aggregates spans into Prometheus text format metrics, optionally served on /metrics.
+
+    The metrics name models and novels, so they are served on localhost only
+    unless another host (0.0.0.0 for every interface) is passed explicitly.
+    """
+    # Ollama durations recorded on llm spans, exported as <name>_seconds_total
+    LLM_DURATIONS = {
+        "loadDurationMs": "novel_llm_load_seconds_total",
+        "promptEvalDurationMs": "novel_llm_prompt_eval_seconds_total",
+        "evalDurationMs": "novel_llm_eval_seconds_total",
+    }
+    LLM_COUNTERS = {
+        "promptEvalCount": "novel_llm_prompt_tokens_total",
+        "evalCount": "novel_llm_eval_tokens_total",
+        "bytesWritten": "novel_llm_bytes_written_total",
+    }
+
+    def __init__(self, port: Optional[int] = None, host: str = "127.0.0.1"):
+        self._lock = threading.Lock()
+        self._durationSum: Dict[Tuple, float] = defaultdict(float)
+        self._durationCount: Dict[Tuple, int] = defaultdict(int)
+        self._errors: Dict[Tuple, int] = defaultdict(int)
+        self._llm: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._server = None
+        if port is not None:
+            self.serve(port, host)
+
+    def on_end(self, span: Span):
+        labels = (span.kind, span.name, span.attributes.get("model", ""))
+        with self._lock:
+            self._durationSum[labels] += (span.durationMs or 0) / 1000
+            self._durationCount[labels] += 1
+            if span.status != "ok":
+                self._errors[labels] += 1
+            if span.kind == KIND_LLM:
+                model = span.attributes.get("model", "")
+                for attribute, metric in self.LLM_DURATIONS.items():
+                    self._llm[(metric, model)] += (span.attributes.get(attribute) or 0) / 1000
+                for attribute, metric in self.LLM_COUNTERS.items():
+                    self._llm[(metric, model)] += span.attributes.get(attribute) or 0
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE novel_span_duration_seconds summary",
+        ]
+        with self._lock:
+            for (kind, name, model), total in sorted(self._durationSum.items()):
+                labels = f'kind="{kind}",name="{name}",model="{model}"'
+                lines.append(f"novel_span_duration_seconds_sum{{{labels}}} {total}")
+                lines.append(f"novel_span_duration_seconds_count{{{labels}}} {self._durationCount[(kind, name, model)]}")
+            lines.append("# TYPE novel_span_errors_total counter")
+            for (kind, name, model), count in sorted(self._errors.items()):
+                lines.append(f'novel_span_errors_total{{kind="{kind}",name="{name}",model="{model}"}} {count}')
+            for metric in list(self.LLM_DURATIONS.values()) + list(self.LLM_COUNTERS.values()):
+                lines.append(f"# TYPE {metric} counter")
+                for (name, model), value in sorted(self._llm.items()):
+                    if name == metric:
+                        lines.append(f'{metric}{{model="{model}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Prometheus metrics on http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """Mirrors spans into an OpenTelemetry tracer, configure the SDK/exporter as usual"""
+    def __init__(self, instrumentationName: str = "ollama-agent"):
+        try:
+            from opentelemetry import trace
+        except ImportError as error:
+            raise ImportError("OpenTelemetryExporter requires the opentelemetry-api package") from error
+        self._trace = trace
+        self._tracer = trace.get_tracer(instrumentationName)
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span):
+        with self._lock:
+            parent = self._spans.get(span.parentId)
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        otelSpan = self._tracer.start_span(
+            span.name,
+            context=context,
+            start_time=int(span.startTime * 1e9),
+            attributes={"kind": span.kind},
+        )
+        with self._lock:
+            self._spans[span.spanId] = otelSpan
+
+    def on_end(self, span: Span):
+        with self._lock:
+            otelSpan = self._spans.pop(span.spanId, None)
+        if otelSpan is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otelSpan.set_attribute(key, value)
+        if span.status != "ok":
+            otelSpan.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otelSpan.end(end_time=int(span.endTime * 1e9))
+
+
+def configure_tracing(jsonlPath: Optional[str] = None, prometheusPort: Optional[int] = None, otel: bool = False,
+                      prometheusHost: str = "127.0.0.1"):
+    """Attach the requested exporters to the global tracer"""
+    if jsonlPath:
+        tracer.add_exporter(JsonlExporter(jsonlPath))
+    if prometheusPort is not None:
+        tracer.add_exporter(PrometheusExporter(port=prometheusPort, host=prometheusHost))
+    if otel:
+        tracer.add_exporter(OpenTelemetryExporter())
@@ -0,0 +1,164 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KIND_NOVEL = "novel"
+KIND_CHAPTER = "chapter"
+KIND_STAGE = "stage"
+KIND_LLM = "llm"
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    traceId: str
+    spanId: str
+    parentId: Optional[str] = None
+    startTime: float = field(default_factory=time.time)
+    endTime: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def durationMs(self) -> Optional[float]:
+        if self.endTime is None:
+            return None
+        return (self.endTime - self.startTime) * 1000
+
+    def set(self, **attributes: Any):
+        for key, value in attributes.items():
+            if value is not None:
+                self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "traceId": self.traceId,
+            "spanId": self.spanId,
+            "parentId": self.parentId,
+            "startTime": self.startTime,
+            "endTime": self.endTime,
+            "durationMs": self.durationMs,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives spans as they start and end, subclasses decide where they go"""
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+_currentSpan: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("currentSpan", default=None)
+
+
+class Tracer:
+    """Nested spans for novel -> chapter -> stage -> llm call.
+
+    The current span lives in a contextvar, so chapters running as concurrent
+    asyncio tasks each get their own parent chain. Without exporters a span is
+    only a small object, so instrumentation can stay on permanently.
+    """
+    def __init__(self):
+        self.exporters: List[SpanExporter] = []
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter: SpanExporter):
+        with self._lock:
+            self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter):
+        with self._lock:
+            if exporter in self.exporters:
+                self.exporters.remove(exporter)
+
+    def shutdown(self):
+        with self._lock:
+            exporters, self.exporters = self.exporters, []
+        for exporter in exporters:
+            exporter.shutdown()
+
+    def current_span(self) -> Optional[Span]:
+        return _currentSpan.get()
+
+    def _notify(self, method: str, span: Span):
+        for exporter in list(self.exporters):
+            try:
+                getattr(exporter, method)(span)
+            except Exception as error:
+                logger.warning(f"Span exporter {type(exporter).__name__} failed: {error}")
+
+    def start_span(self, name: str, kind: str, **attributes: Any) -> Span:
+        """Start a span under the current one without making it current, end it with end_span.
+        For spans that outlive one block, e.g. a chapter handed between pipeline stages"""
+        parent = _currentSpan.get()
+        span = Span(
+            name=name,
+            kind=kind,
+            traceId=parent.traceId if parent is not None else uuid.uuid4().hex,
+            spanId=uuid.uuid4().hex[:16],
+            parentId=parent.spanId if parent is not None else None,
+        )
+        span.set(**attributes)
+        self._notify("on_start", span)
+        return span
+
+    def end_span(self, span: Span, error: BaseException = None):
+        if error is not None:
+            span.status = "error"
+            span.error = str(error) or type(error).__name__
+        span.endTime = time.time()
+        self._notify("on_end", span)
+
+    @contextmanager
+    def activate(self, span: Span):
+        """Make span the parent of the spans opened inside the block, without ending it"""
+        token = _currentSpan.set(span)
+        try:
+            yield span
+        finally:
+            _currentSpan.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes: Any):
+        span = self.start_span(name, kind, **attributes)
+        try:
+            with self.activate(span):
+                yield span
+        except BaseException as error:
+            self.end_span(span, error)
+            raise
+        self.end_span(span)
+
+
+tracer = Tracer()
+
+
+def format_duration(seconds: float) -> str:
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    return f"{hours:02d}:{minutes:02d}:{int(seconds % 60):02d}"
+
+
+def get_tracer() -> Tracer:
+    return tracer
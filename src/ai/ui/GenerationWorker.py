@@ -0,0 +1,109 @@
+import queue
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+from ai.agents.NovelWriter import NovelWriter
+from ai.models.novel.Schema import NovelSpec
+from ai.tracing.Tracer import tracer, Span, SpanExporter, KIND_NOVEL, KIND_STAGE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVENT_STAGE_START = "stage_start"
+EVENT_STAGE_END = "stage_end"
+EVENT_TOKEN = "token"
+EVENT_DISCARD = "discard"
+EVENT_DONE = "done"
+EVENT_ERROR = "error"
+EVENT_CANCELLED = "cancelled"
+
+
+class StageProgressExporter(SpanExporter):
+    """Forwards the stage spans of one novel run to a queue.
+
+    Only spans of the trace started by the first novel span are forwarded, so
+    other work traced in the same process does not show up as progress.
+    """
+    def __init__(self, events: "queue.Queue[Tuple[str, Any]]"):
+        self.events = events
+        self.traceId: Optional[str] = None
+
+    def on_start(self, span: Span):
+        if span.kind == KIND_NOVEL and self.traceId is None:
+            self.traceId = span.traceId
+        elif span.kind == KIND_STAGE and span.traceId == self.traceId:
+            self.events.put((EVENT_STAGE_START, span.attributes.get("stage", span.name)))
+
+    def on_end(self, span: Span):
+        if span.kind == KIND_STAGE and span.traceId == self.traceId:
+            self.events.put((EVENT_STAGE_END, (span.attributes.get("stage", span.name), span.status, span.durationMs)))
+
+
+class GenerationWorker:
+    """Runs NovelWriter.generateNovel on its own thread and event loop.
+
+    Everything the UI needs arrives as (event, payload) tuples on `events`, a
+    thread safe queue the Tk thread drains from an after() callback:
+    stage_start/stage_end per stage, (stage, token) per streamed token, discard
+    (stage) when a stage hit its token limit and streams again, and finally
+    done (chapters), error (message) or cancelled. cancel() can be
+    called from any thread, stages finished so far stay in the run manifest.
+    """
+    def __init__(self, writerFactory: Callable[..., NovelWriter], novelSpec: NovelSpec, resume: bool = False):
+        self.writerFactory = writerFactory
+        self.novelSpec = novelSpec
+        self.resume = resume
+        self.events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self.novelWriter: Optional[NovelWriter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="novel-generation")
+
+    def start(self) -> "GenerationWorker":
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def join(self, timeout: float = None):
+        self._thread.join(timeout)
+
+    def cancel(self):
+        self._cancelled.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    def _run(self):
+        try:
+            chapters = asyncio.run(self._generate())
+        except asyncio.CancelledError:
+            self.events.put((EVENT_CANCELLED, None))
+        except Exception as e:
+            logger.error(f"Novel generation failed: {str(e)}")
+            self.events.put((EVENT_ERROR, str(e)))
+        else:
+            self.events.put((EVENT_DONE, chapters))
+
+    async def _generate(self) -> List[str]:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self._cancelled.is_set():
+            raise asyncio.CancelledError()
+        exporter = StageProgressExporter(self.events)
+        tracer.add_exporter(exporter)
+        self.novelWriter = self.writerFactory(onToken=lambda stage, token: self.events.put((EVENT_TOKEN, (stage, token))),
+                                              onDiscard=lambda stage: self.events.put((EVENT_DISCARD, stage)))
+        try:
+            chapters = await self.novelWriter.generateNovel(self.novelSpec, resume=self.resume)
+        finally:
+            tracer.remove_exporter(exporter)
+            self.novelWriter.close()
+        if not chapters:
+            raise RuntimeError("novel generation did not complete, see the log for the failing stage")
+        return chapters
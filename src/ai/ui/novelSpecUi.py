@@ -1,18 +1,37 @@
 import customtkinter as ctk
 from tkinter import messagebox
 from tkinter import ttk, Canvas, Frame, Scrollbar
+import os
+import queue
 import yaml
-from ai.models.novel.Schema import NovelSpec, Character, ChapterSpec
+from typing import Callable
+from ai.agents.NovelWriter import NovelWriter
+from ai.batch.BatchRunner import write_novel
+from ai.models.novel.Schema import NovelSpec, Character, ChapterSpec, loadNovelSpec
 from ai.models.SafetyConfig import SafetyConfig
+from ai.ui.GenerationWorker import GenerationWorker, EVENT_STAGE_START, EVENT_STAGE_END, EVENT_TOKEN, EVENT_DISCARD, EVENT_DONE, EVENT_ERROR, EVENT_CANCELLED
+
+# Generation events are drained every POLL_INTERVAL_MS (~60 fps), at most MAX_EVENTS_PER_POLL per frame
+POLL_INTERVAL_MS = 16
+MAX_EVENTS_PER_POLL = 500
+# Generated text kept in the output box, older text is dropped so inserts stay cheap
+MAX_OUTPUT_CHARS = 20000
+WORKER_CLOSE_TIMEOUT = 10.0
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, writerFactory: Callable[..., NovelWriter] = None, specPath: str = "novel_spec.yml", resume: bool = False):
         super().__init__()
         self.title("NovelSpec and SafetyConfig UI")
         self.geometry("800x600")
 
         self.novel_spec = None
         self.safety_config = SafetyConfig()
+        # Builds the NovelWriter for a run, called on the worker thread with onToken=... and onDiscard=...
+        self.writerFactory = writerFactory
+        self.specPath = specPath
+        self.resume = resume
+        self.worker: GenerationWorker = None
+        self.output_text = None
 	
         # Container frame for menu and main content
         self.top_frame = ctk.CTkFrame(self)
@@ -28,6 +47,12 @@ class App(ctk.CTk):
         self.safety_spec_button = ctk.CTkButton(self.menu_frame, text="Safety Spec", command=self.show_safety_spec)
         self.safety_spec_button.pack(pady=2)
 
+        self.generate_button = ctk.CTkButton(self.menu_frame, text="Generate", command=self.start_generation)
+        self.generate_button.pack(pady=2)
+
+        self.cancel_button = ctk.CTkButton(self.menu_frame, text="Cancel", command=self.cancel_generation, state="disabled")
+        self.cancel_button.pack(pady=2)
+
         # Content frame with scrollable
         self.scrollable_frame = ctk.CTkScrollableFrame(self.top_frame, width=600)
         self.scrollable_frame.pack(side="right", fill="both", expand=True)
@@ -44,6 +69,7 @@ class App(ctk.CTk):
         self.progress_label = ctk.CTkLabel(self.progress_frame, textvariable=self.progress_var)
         self.progress_label.pack(side="right", padx=10)
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.show_novel_spec()
 
     def show_novel_spec(self):
@@ -229,6 +255,110 @@ class App(ctk.CTk):
             yaml.dump(self.safety_config.__dict__, file)
         messagebox.showinfo("Saved", "SafetyConfig saved to safety_config.yaml")
 
+    def show_generation(self):
+        for widget in self.scrollable_frame.winfo_children():
+            widget.destroy()
+
+        self.stage_label = ctk.CTkLabel(self.scrollable_frame, text="", anchor="w")
+        self.stage_label.grid(row=0, column=0, columnspan=2, pady=5, padx=10, sticky="w")
+        self.output_text = ctk.CTkTextbox(self.scrollable_frame, height=450, wrap="word")
+        self.output_text.grid(row=1, column=0, columnspan=2, pady=5, padx=10, sticky="nsew")
+        self.output_stage = None
+
+    def start_generation(self):
+        if self.worker is not None and self.worker.running:
+            return
+        if self.writerFactory is None:
+            messagebox.showerror("Error", "No model configured, start the UI with `python src/main.py --ui`")
+            return
+        try:
+            novelSpec = self.novel_spec or loadNovelSpec(self.specPath)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not load {self.specPath}: {str(e)}")
+            return
+
+        self.show_generation()
+        self.stages_done = 0
+        self.stages_total = None
+        self.progress_bar.set(0)
+        self.progress_var.set("Loading model...")
+        self.generate_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.worker = GenerationWorker(self.writerFactory, novelSpec, self.resume).start()
+        self.after(POLL_INTERVAL_MS, self.poll_generation)
+
+    def cancel_generation(self):
+        if self.worker is not None and self.worker.running:
+            self.progress_var.set("Cancelling...")
+            self.cancel_button.configure(state="disabled")
+            self.worker.cancel()
+
+    def poll_generation(self):
+        """Apply queued worker events to the widgets, one text insert per frame however many tokens arrived"""
+        worker = self.worker
+        tokens = []
+        finished = False
+        for _ in range(MAX_EVENTS_PER_POLL):
+            try:
+                event, payload = worker.events.get_nowait()
+            except queue.Empty:
+                break
+            if event == EVENT_TOKEN:
+                stage, token = payload
+                if stage != self.output_stage:
+                    tokens.append(f"\n\n=== {stage} ===\n")
+                    self.output_stage = stage
+                tokens.append(token)
+            elif event == EVENT_DISCARD:
+                # The text is interleaved with other stages, mark it void instead of cutting it out
+                tokens.append(f"\n\n=== {payload} stopped at its token limit, the text above is discarded and generated again ===\n")
+                self.output_stage = None
+            elif event == EVENT_STAGE_START:
+                self.progress_var.set(f"{payload} ({self.stages_done}/{self.stage_total()})")
+            elif event == EVENT_STAGE_END:
+                stage, status, durationMs = payload
+                self.stages_done += 1
+                self.progress_bar.set(min(1.0, self.stages_done / self.stage_total()))
+                self.progress_var.set(f"{stage} {status} in {durationMs / 1000:.1f}s ({self.stages_done}/{self.stage_total()})")
+            else:
+                finished = True
+                self.finish_generation(event, payload)
+                break
+        if tokens and self.output_text is not None and self.output_text.winfo_exists():
+            self.output_text.insert("end", "".join(tokens))
+            overflow = len(self.output_text.get("1.0", "end-1c")) - MAX_OUTPUT_CHARS
+            if overflow > 0:
+                self.output_text.delete("1.0", f"1.0+{overflow}c")
+            self.output_text.see("end")
+        if not finished:
+            self.after(POLL_INTERVAL_MS, self.poll_generation)
+
+    def stage_total(self) -> int:
+        if self.stages_total is None and self.worker.novelWriter is not None:
+            self.stages_total = self.worker.novelWriter.expected_stages(self.worker.novelSpec)
+        return max(self.stages_total or 1, self.stages_done, 1)
+
+    def finish_generation(self, event: str, payload):
+        self.generate_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+        if event == EVENT_DONE:
+            path = write_novel(self.worker.novelWriter.llmConfig.modelStore, payload)
+            self.progress_bar.set(1)
+            self.progress_var.set(f"Done, {len(payload)} chapters")
+            messagebox.showinfo("Done", f"Novel written to {os.path.abspath(path)}")
+        elif event == EVENT_CANCELLED:
+            self.progress_var.set("Cancelled, finished stages are kept for --resume")
+        elif event == EVENT_ERROR:
+            self.progress_var.set("Failed")
+            messagebox.showerror("Error", f"Novel generation failed: {payload}")
+
+    def on_close(self):
+        if self.worker is not None and self.worker.running:
+            # Wait for the worker to unpin its models, a daemon thread killed at exit would leave them loaded
+            self.worker.cancel()
+            self.worker.join(WORKER_CLOSE_TIMEOUT)
+        self.destroy()
+
 if __name__ == "__main__":
     ctk.set_appearance_mode("dark")
     app = App()
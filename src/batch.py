@@ -0,0 +1,51 @@
+import asyncio
+import argparse
+import datetime
+from ai.batch.JobQueue import JobQueue
+from ai.batch.BatchRunner import BatchRunner, find_specs, summarize
+from ai.tracing.Tracer import tracer, format_duration
+from ai.tracing.Exporters import configure_tracing
+
+parser = argparse.ArgumentParser(description="Generate novels for a set of NovelSpec files and models")
+parser.add_argument("specs", nargs="+", help="Spec YAML files, directories or glob patterns")
+parser.add_argument("--models", nargs="+", default=["jaahas/tiger-gemma-v2:latest"], help="Generate every spec with each of these models")
+parser.add_argument("--base-url", default="http://localhost:11434")
+parser.add_argument("--workers", type=int, default=2, help="Jobs running at once across all models")
+parser.add_argument("--per-model", type=int, default=1, help="Jobs running at once on the same model")
+parser.add_argument("--model-limit", action="append", default=[], metavar="MODEL=N", help="Override --per-model for one model")
+parser.add_argument("--queue", default="./contents/batch-queue.sqlite", help="Job queue database, reused to resume a batch")
+parser.add_argument("--max-attempts", type=int, default=2, help="Attempts per job before it is marked failed")
+parser.add_argument("--retry-failed", action="store_true", help="Requeue jobs that failed in a previous batch")
+parser.add_argument("--chunk-pages", type=int, default=None, help="Write and edit chapters this many pages per request")
+parser.add_argument("--no-cache", action="store_true", help="Always call the model, skip the on-disk response cache")
+parser.add_argument("--trace-jsonl", default=None, help="Append job/novel/chapter/stage/llm spans to this JSONL file")
+parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+parser.add_argument("--metrics-host", default="127.0.0.1", help="Interface to serve metrics on, 0.0.0.0 for every interface")
+args = parser.parse_args()
+
+
+async def main():
+    configure_tracing(args.trace_jsonl, args.metrics_port, False, args.metrics_host)
+    print(datetime.datetime.now())
+    modelLimits = {}
+    for limit in args.model_limit:
+        model, _, count = limit.rpartition("=")
+        modelLimits[model] = int(count)
+
+    queue = JobQueue(args.queue, maxAttempts=args.max_attempts)
+    runner = BatchRunner(queue, base_url=args.base_url, maxWorkers=args.workers, perModelLimit=args.per_model,
+                         modelLimits=modelLimits, useCache=not args.no_cache, chunkPages=args.chunk_pages)
+    specs = find_specs(args.specs)
+    print(f"Queueing {len(specs)} specs x {len(args.models)} models...")
+    runner.enqueue(specs, args.models, args.retry_failed)
+
+    with tracer.span("batch", "run", specs=len(specs), models=len(args.models)) as run:
+        counts = await runner.run()
+    tracer.shutdown()
+    print(summarize(queue))
+    print(f"Batch finished in {format_duration(run.durationMs / 1000)}: {counts}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+import os
+import asyncio
+import argparse
+import datetime
+from ai.models.novel.Schema import loadNovelSpec
+from ai.bench.NovelBenchmark import NovelBenchmark, Recording, write_json, write_csv, load_qualities, load_model_rows, to_markdown
+from ai.bench.FakeOllamaServer import FakeOllamaServer
+
+parser = argparse.ArgumentParser(description="Benchmark NovelWriter stages across models")
+parser.add_argument("--models", nargs="+", default=["jaahas/tiger-gemma-v2:latest"], help="Models to benchmark")
+parser.add_argument("--spec", default="./novel_spec.yml", help="NovelSpec YAML to run")
+parser.add_argument("--chapters", type=int, default=1, help="Chapters to run through plot, write and edit")
+parser.add_argument("--base-url", default="http://localhost:11434")
+parser.add_argument("--output-dir", default="./contents/bench")
+parser.add_argument("--markdown", default=None, help="Markdown file to regenerate, e.g. performance.md")
+parser.add_argument("--replay", action="store_true", help="Run against a local fake Ollama backend instead of --base-url")
+parser.add_argument("--recording", default=None, help="Recorded responses replayed by --replay")
+parser.add_argument("--record", default=None, help="Save responses of this run for later --replay")
+parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per token of the fake backend")
+args = parser.parse_args()
+
+
+async def main():
+    novelSpec = loadNovelSpec(args.spec)
+    base_url = args.base_url
+    fakeServer = None
+    recording = Recording() if args.record else None
+    if args.replay:
+        fakeServer = FakeOllamaServer(tokenDelay=args.token_delay, arrayLength=novelSpec.totalChapters)
+        if args.recording:
+            fakeServer.responder = Recording.load(args.recording).responder(fakeServer.default_response)
+        fakeServer.start()
+        base_url = fakeServer.url
+
+    print(datetime.datetime.now())
+    try:
+        results = await NovelBenchmark(novelSpec, args.models, base_url, args.chapters, recording).run()
+    finally:
+        if fakeServer is not None:
+            fakeServer.stop()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    write_json(results, os.path.join(args.output_dir, f"bench-{stamp}.json"))
+    write_csv(results, os.path.join(args.output_dir, f"bench-{stamp}.csv"))
+    markdownPath = args.markdown or os.path.join(args.output_dir, f"bench-{stamp}.md")
+    # Rows of models not benchmarked this time, and hand entered Quality ratings, are kept
+    markdown = to_markdown(results, load_qualities(markdownPath), load_model_rows(markdownPath))
+    with open(markdownPath, "w") as f:
+        f.write(markdown)
+    if recording is not None:
+        recording.save(args.record)
+    print(markdown)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
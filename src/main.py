@@ -2,43 +2,72 @@ import customtkinter as ctk
 import datetime
 from ai.models.LLMProvider import LLMProvider
 from ai.agents.NovelWriter import NovelWriter
+from ai.batch.BatchRunner import write_novel
 from ai.models.novel.Schema import NovelSpec, loadNovelSpec
 from ai.ui.novelSpecUi import App
-import time
+from ai.tracing.Tracer import tracer, format_duration
+from ai.tracing.Exporters import configure_tracing
+import argparse
 
-llmConfig = LLMProvider.create_llm_config(base_url="http://localhost:11434", model = "jaahas/tiger-gemma-v2:latest")
+parser = argparse.ArgumentParser(description="Generate a novel from a NovelSpec")
+parser.add_argument("--no-cache", action="store_true", help="Always call the model, skip the on-disk response cache")
+parser.add_argument("--resume", action="store_true", help="Skip stages finished by the previous run of the same spec")
+parser.add_argument("--trace-jsonl", default=None, help="Append novel/chapter/stage/llm spans to this JSONL file")
+parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+parser.add_argument("--metrics-host", default="127.0.0.1", help="Interface to serve metrics on, 0.0.0.0 for every interface")
+parser.add_argument("--chunk-pages", type=int, default=None, help="Write and edit chapters this many pages per request")
+parser.add_argument("--editor-model", default=None, help="Run the editor stage on this model")
+parser.add_argument("--editor-url", default=None, help="Run the editor stage on this Ollama node")
+parser.add_argument("--otel", action="store_true", help="Export spans through the configured OpenTelemetry SDK")
+parser.add_argument("--ui", action="store_true", help="Open the NovelSpec UI and generate from its Generate button")
+parser.add_argument("--no-speculative", action="store_true", help="Finish the outline and character profiles before plotting any chapter")
+args = parser.parse_args()
 
-novelWriter = NovelWriter(llmConfig)
+configure_tracing(args.trace_jsonl, args.metrics_port, args.otel, args.metrics_host)
+
+llmConfig = LLMProvider.create_llm_config(base_url="http://localhost:11434", model = "jaahas/tiger-gemma-v2:latest", useCache=not args.no_cache)
+
+stageConfigs = {}
+if args.editor_model or args.editor_url:
+    stageConfigs["editor"] = LLMProvider.create_llm_config(base_url=args.editor_url or llmConfig.base_url, model=args.editor_model or llmConfig.model,
+                                                           useCache=not args.no_cache)
+
+SPEC_PATH = "./contents/.novel-fspec.yml"
+
+def create_writer(**kwargs) -> NovelWriter:
+    return NovelWriter(llmConfig, chunkPages=args.chunk_pages, stageConfigs=stageConfigs, speculativePlots=not args.no_speculative, **kwargs)
 
 async def main():
-    start_time = time.time()
+    with tracer.span("run", "run", model=llmConfig.model) as run:
+        await generate()
+    tracer.shutdown()
+    print(f"Novel generation completed in {run.durationMs / 1000:.2f} seconds.")
+    print(f"Duration: {format_duration(run.durationMs / 1000)}")
+
+async def generate():
     print(datetime.datetime.now())
     print("Starting novel generation...")
-    
-    # ctk.set_appearance_mode("dark")
-    # app = App()
-    # app.mainloop()
-
-    novelSpec: NovelSpec =loadNovelSpec("./contents/.novel-fspec.yml")
-    chapters = await novelWriter.generateNovel(novelSpec)
-
-    # # Output the results
-    novel_content = ''
-    for index, chapter in enumerate(chapters):
-        novel_content += f"\n--- Chapter {index + 1} ---\n"
-        novel_content += chapter
-    
-    with open(f"{llmConfig.modelStore}/novel.md", "w") as f:
-        f.write(novel_content)
-    
-    end_time = time.time()
-    duration = end_time - start_time
-    hours = int(duration // 3600)
-    minutes = int((duration % 3600) // 60)
-    seconds = int(duration % 60)
-    print(f"Novel generation completed in {duration:.2f} seconds.")
-    print(f"Duration: {hours:02d}:{minutes:02d}:{seconds:02d}")
+
+    novelSpec: NovelSpec =loadNovelSpec(SPEC_PATH)
+    novelWriter = create_writer()
+    try:
+        chapters = await novelWriter.generateNovel(novelSpec, resume=args.resume)
+    finally:
+        novelWriter.close()
+
+    if not chapters:
+        # Keep the novel.md of an earlier run, rerun with --resume to continue from the finished stages
+        print("Novel generation did not complete, see the log for the failing stage.")
+        return
+    write_novel(llmConfig.modelStore, chapters)
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    if args.ui:
+        # Generation runs on a worker thread, the Tk main loop stays responsive
+        ctk.set_appearance_mode("dark")
+        app = App(create_writer, SPEC_PATH, args.resume)
+        app.mainloop()
+        tracer.shutdown()
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -3,8 +3,8 @@ import datetime
 from ai.models.LLMProvider import LLMProvider
 from ai.agents.SystemAgent import SystemAgent
 from ai.models.novel.Schema import AgentResponse
-from ai.operators.executer import process_command
-import time
+from ai.operators.executer import aprocess_command
+from ai.tracing.Tracer import tracer, format_duration
 
 llmConfig = LLMProvider.create_llm_config(base_url="http://localhost:11434", model = "phi4")
 
@@ -12,29 +12,39 @@ systemAgent = SystemAgent(llmConfig)
 
 EXIT_COMMANDS = ["exit", "bye", "quit"]
 
-def processPrompt(prompt):
-        start_time = time.time()
+def printChunk(stream, text):
+    """Command output as it arrives, the full result is printed once the command is done"""
+    print(f"[{stream}] {text}", end="" if text.endswith("\n") else "\n", flush=True)
+
+async def processPrompt(prompt):
         print(datetime.datetime.now())
-        response: AgentResponse = systemAgent.queryLLM(prompt)
-        actionResponse = process_command(response.content)
-        print(actionResponse)
-        end_time = time.time()
-        duration = end_time - start_time
-        hours = int(duration // 3600)
-        minutes = int((duration % 3600) // 60)
-        seconds = int(duration % 60)
+        with tracer.span("system_command", "request", model=llmConfig.model) as span:
+            response: AgentResponse = systemAgent.resolve(prompt)
+            span.set(route=response.metadata.get("route"))
+            steps = response.content.get("steps")
+            with tracer.span("execute", "command", command=response.content.get("command"), steps=len(steps) if steps else None):
+                actionResponse = await aprocess_command(response.content, onChunk=printChunk)
+            print(actionResponse)
+            if steps:
+                summary: AgentResponse = systemAgent.summarize(prompt, response.content, actionResponse)
+                print(summary.content)
+        duration = span.durationMs / 1000
         print(f"System command completed in {duration:.2f} seconds.")
-        print(f"Duration: {hours:02d}:{minutes:02d}:{seconds:02d}")
+        print(f"Duration: {format_duration(duration)}")
 
 async def main():
     exit_flag = False
-    while not exit_flag:
-        user_input = input("Enter your command (or 'exit','bye','quit' to quit): ")
-        if EXIT_COMMANDS.__contains__(user_input):
-            exit_flag = True
-            continue
-        
-        processPrompt(user_input)
+    try:
+        while not exit_flag:
+            user_input = input("Enter your command (or 'exit','bye','quit' to quit): ")
+            if EXIT_COMMANDS.__contains__(user_input):
+                exit_flag = True
+                continue
+
+            await processPrompt(user_input)
+    finally:
+        # Also on Ctrl+C, so the model is not left pinned on the node
+        systemAgent.close()
 
 
 if __name__ == "__main__":
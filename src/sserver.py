@@ -0,0 +1,43 @@
+import asyncio
+import argparse
+from ai.models.LLMProvider import LLMProvider
+from ai.agents.SystemAgent import SystemAgent
+from ai.server.SessionServer import SessionServer, serve
+from ai.tracing.Tracer import tracer
+from ai.tracing.Exporters import configure_tracing
+from ai.operators.executer import DEFAULT_TIMEOUT
+
+parser = argparse.ArgumentParser(description="Serve SystemAgent sessions over HTTP or a unix socket")
+parser.add_argument("--model", default="phi4")
+parser.add_argument("--base-url", default="http://localhost:11434")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--socket", default=None, help="Listen on this unix socket instead of --host/--port")
+parser.add_argument("--max-sessions", type=int, default=256, help="Sessions kept before the least recently used is dropped")
+parser.add_argument("--history", type=int, default=100, help="Requests kept in each session's history")
+parser.add_argument("--command-timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a shell command is killed")
+parser.add_argument("--trace-jsonl", default=None, help="Append request/command/llm spans to this JSONL file")
+parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+parser.add_argument("--metrics-host", default="127.0.0.1", help="Interface to serve metrics on, 0.0.0.0 for every interface")
+args = parser.parse_args()
+
+
+async def main():
+    configure_tracing(args.trace_jsonl, args.metrics_port, False, args.metrics_host)
+    llmConfig = LLMProvider.create_llm_config(base_url=args.base_url, model=args.model)
+    systemAgent = SystemAgent(llmConfig)
+    server = SessionServer(systemAgent, maxSessions=args.max_sessions, historyLimit=args.history, timeout=args.command_timeout)
+    runner = await serve(server, args.host, args.port, args.socket)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        systemAgent.close()
+        tracer.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
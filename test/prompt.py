@@ -1,8 +1,18 @@
 import customtkinter as ctk
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+import queue
+import time
 import json
-from ollama import generate
+from ollama import Client
+
+# Events are drained from the worker queue every POLL_INTERVAL_MS, so the window stays at ~60 fps
+POLL_INTERVAL_MS = 16
+# Runs sent to Ollama at once, the server queues the rest (see OLLAMA_NUM_PARALLEL)
+MAX_PARALLEL_RUNS = 8
 
 class ResponseSchema(Enum):
     USER_JSON = "user_json"
@@ -14,7 +24,15 @@ class OllamaPromptUI:
         # Initialize the main window
         self.root = ctk.CTk()
         self.root.title("Ollama Prompt Interface")
-        self.root.geometry("800x600")
+        self.root.geometry("1200x800")
+
+        # Runs of the current comparison, their events arrive on self.events from worker threads
+        self.events: "queue.Queue[Tuple[int, int, str, Any]]" = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_RUNS, thread_name_prefix="prompt-run")
+        self.clients: Dict[str, Client] = {}
+        self.batch = 0
+        self.cancelled = threading.Event()
+        self.runs: List[Dict[str, Any]] = []
         
         # Schema templates
         self.schema_templates = {
@@ -58,7 +76,7 @@ class OllamaPromptUI:
         
         # Configure grid layout
         self.root.grid_columnconfigure(0, weight=1)
-        self.root.grid_rowconfigure(2, weight=1)
+        self.root.grid_rowconfigure(6, weight=1)
         
         # Create and configure UI elements
         self._setup_ui()
@@ -110,29 +128,59 @@ class OllamaPromptUI:
         )
         self.schema_preview.grid(row=3, column=0, padx=10, pady=(5, 10), sticky="nsew")
         
+        # Models and temperatures to compare, every combination runs side by side
+        self.runs_frame = ctk.CTkFrame(self.root)
+        self.runs_frame.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
+        self.runs_frame.grid_columnconfigure((1, 3), weight=1)
+
+        ctk.CTkLabel(self.runs_frame, text="Models:", font=("Arial", 12)).grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        self.models_entry = ctk.CTkEntry(self.runs_frame)
+        self.models_entry.insert(0, "llama3.2:3b")
+        self.models_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+
+        ctk.CTkLabel(self.runs_frame, text="Temperatures:", font=("Arial", 12)).grid(row=0, column=2, padx=5, pady=2, sticky="w")
+        self.temperatures_entry = ctk.CTkEntry(self.runs_frame, width=120)
+        self.temperatures_entry.insert(0, "0.7")
+        self.temperatures_entry.grid(row=0, column=3, padx=5, pady=2, sticky="ew")
+
+        ctk.CTkLabel(self.runs_frame, text="Host:", font=("Arial", 12)).grid(row=1, column=0, padx=5, pady=2, sticky="w")
+        self.host_entry = ctk.CTkEntry(self.runs_frame)
+        self.host_entry.insert(0, "http://localhost:11434")
+        self.host_entry.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
+
+        ctk.CTkLabel(self.runs_frame, text="(comma-separated)", font=("Arial", 11)).grid(row=1, column=2, columnspan=2, padx=5, pady=2, sticky="w")
+
         # Response area
         self.response_label = ctk.CTkLabel(
             self.root,
-            text="Response:",
+            text="Responses:",
             font=("Arial", 14)
         )
-        self.response_label.grid(row=4, column=0, padx=10, pady=(10, 0), sticky="w")
-        
-        self.response_text = ctk.CTkTextbox(
-            self.root,
-            height=200,
-            font=("Arial", 12)
-        )
-        self.response_text.grid(row=5, column=0, padx=10, pady=(5, 10), sticky="nsew")
-        
-        # Submit button
+        self.response_label.grid(row=5, column=0, padx=10, pady=(10, 0), sticky="w")
+
+        # One column per run, rebuilt by _send_prompt
+        self.results_frame = ctk.CTkScrollableFrame(self.root, orientation="horizontal", height=300)
+        self.results_frame.grid(row=6, column=0, padx=10, pady=(5, 10), sticky="nsew")
+
+        # Submit and cancel buttons
+        self.buttons_frame = ctk.CTkFrame(self.root, fg_color="transparent")
+        self.buttons_frame.grid(row=7, column=0, padx=10, pady=10)
+
         self.submit_button = ctk.CTkButton(
-            self.root,
+            self.buttons_frame,
             text="Send to Ollama",
             command=self._send_prompt
         )
-        self.submit_button.grid(row=6, column=0, padx=10, pady=10)
-        
+        self.submit_button.pack(side="left", padx=5)
+
+        self.cancel_button = ctk.CTkButton(
+            self.buttons_frame,
+            text="Cancel",
+            command=self._cancel,
+            state="disabled"
+        )
+        self.cancel_button.pack(side="left", padx=5)
+
         # Initialize schema preview
         self._update_schema_preview()
         
@@ -148,35 +196,151 @@ class OllamaPromptUI:
             self.schema_preview.insert("1.0", "No specific schema required")
         
     def _send_prompt(self):
+        """Start one streamed run per (model, temperature) pair on the worker pool."""
         prompt = self.prompt_input.get("1.0", "end-1c")
         schema = self.schema_var.get()
-        
+
         # Prepare the request based on selected schema
         format_prompt, responseSchema = self._format_prompt(prompt, schema)
-        
         try:
-            # Send request using ollama client
-            response = generate(
-                model="llama3.2:3b",  # Change this to your preferred model
-                prompt=format_prompt,
-                format=responseSchema
-            )
-            
-            self.response_text.delete("1.0", "end")
-            self.response_text.insert("1.0", response['response'])
-                
+            runs = self._parse_runs()
+        except ValueError as e:
+            self._show_runs([])
+            self.response_label.configure(text=f"Responses: {str(e)}")
+            return
+
+        # Events of an earlier comparison still in flight are dropped by their batch number
+        self.cancelled.set()
+        self.cancelled = threading.Event()
+        self.batch += 1
+        self._show_runs(runs)
+        self.response_label.configure(text=f"Responses: {len(runs)} runs")
+        self.cancel_button.configure(state="normal")
+        host = self.host_entry.get().strip() or "http://localhost:11434"
+        for index, (model, temperature) in enumerate(runs):
+            self.executor.submit(self._run, self.batch, index, host, model, temperature, format_prompt, responseSchema, self.cancelled)
+        self.root.after(POLL_INTERVAL_MS, self._poll, self.batch)
+
+    def _parse_runs(self) -> List[Tuple[str, float]]:
+        models = [model.strip() for model in self.models_entry.get().split(",") if model.strip()]
+        temperatures = [float(value) for value in self.temperatures_entry.get().split(",") if value.strip()] or [0.7]
+        if not models:
+            raise ValueError("enter at least one model")
+        return list(itertools.product(models, temperatures))
+
+    def _client(self, host: str) -> Client:
+        # One client per host, its connection pool is shared by all worker threads
+        client = self.clients.get(host)
+        if client is None:
+            client = self.clients.setdefault(host, Client(host=host))
+        return client
+
+    def _run(self, batch: int, index: int, host: str, model: str, temperature: float, prompt: str,
+             responseSchema: Optional[Dict[str, Any]], cancelled: threading.Event):
+        """Stream one generation on a worker thread, reporting tokens and timings through self.events."""
+        start = time.perf_counter()
+        firstToken = None
+        chunks = 0
+        final = None
+        try:
+            stream = self._client(host).generate(model=model, prompt=prompt, format=responseSchema,
+                                                 options={"temperature": temperature}, stream=True)
+            for chunk in stream:
+                if cancelled.is_set():
+                    self.events.put((batch, index, "cancelled", None))
+                    return
+                if chunk.response:
+                    if firstToken is None:
+                        firstToken = time.perf_counter()
+                    chunks += 1
+                    self.events.put((batch, index, "token", chunk.response))
+                if chunk.done:
+                    final = chunk
         except Exception as e:
-            self.response_text.delete("1.0", "end")
-            self.response_text.insert("1.0", f"Error: {str(e)}")
-    
-    def _format_prompt(self, prompt: str, schema: str) -> str:
+            self.events.put((batch, index, "error", str(e)))
+            return
+        end = time.perf_counter()
+        tokens = final.eval_count if final is not None and final.eval_count else chunks
+        if final is not None and final.eval_duration:
+            tokensPerSec = final.eval_count / (final.eval_duration / 1e9)
+        else:
+            tokensPerSec = chunks / (end - firstToken) if firstToken is not None and end > firstToken else None
+        self.events.put((batch, index, "done", {
+            "latency": end - start,
+            "ttft": firstToken - start if firstToken is not None else None,
+            "tokens": tokens,
+            "tokensPerSec": tokensPerSec,
+        }))
+
+    def _show_runs(self, runs: List[Tuple[str, float]]):
+        """Replace the result columns with one header, response box and stats line per run."""
+        for widget in self.results_frame.winfo_children():
+            widget.destroy()
+        self.runs = []
+        for index, (model, temperature) in enumerate(runs):
+            column = ctk.CTkFrame(self.results_frame)
+            column.grid(row=0, column=index, padx=5, pady=5, sticky="ns")
+            ctk.CTkLabel(column, text=f"{model} @ {temperature:g}", font=("Arial", 12, "bold")).pack(padx=5, pady=(5, 0))
+            text = ctk.CTkTextbox(column, width=360, height=240, font=("Arial", 12), wrap="word")
+            text.pack(padx=5, pady=5, fill="both", expand=True)
+            stats = ctk.CTkLabel(column, text="waiting...", font=("Arial", 11))
+            stats.pack(padx=5, pady=(0, 5))
+            self.runs.append({"text": text, "stats": stats, "finished": False})
+
+    def _poll(self, batch: int):
+        """Apply queued worker events, one insert per run per frame however many tokens arrived."""
+        if batch != self.batch:
+            return
+        tokens: Dict[int, List[str]] = {}
+        while True:
+            try:
+                eventBatch, index, event, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if eventBatch != batch:
+                continue
+            run = self.runs[index]
+            if event == "token":
+                tokens.setdefault(index, []).append(payload)
+                continue
+            run["finished"] = True
+            if event == "done":
+                ttft = f"{payload['ttft']:.2f}s" if payload["ttft"] is not None else "n/a"
+                rate = f"{payload['tokensPerSec']:.1f} tok/s" if payload["tokensPerSec"] is not None else "n/a"
+                run["stats"].configure(text=f"{payload['latency']:.2f}s total, first token {ttft}, {payload['tokens']} tokens, {rate}")
+            elif event == "error":
+                run["stats"].configure(text=f"Error: {payload}")
+            else:
+                run["stats"].configure(text="cancelled")
+        for index, parts in tokens.items():
+            run = self.runs[index]
+            run["text"].insert("end", "".join(parts))
+            run["text"].see("end")
+            if not run["finished"]:
+                run["stats"].configure(text="streaming...")
+        if all(run["finished"] for run in self.runs):
+            self.cancel_button.configure(state="disabled")
+            return
+        self.root.after(POLL_INTERVAL_MS, self._poll, batch)
+
+    def _cancel(self):
+        """Stop the runs of the current comparison, each worker drops its stream at the next chunk."""
+        self.cancelled.set()
+        self.cancel_button.configure(state="disabled")
+
+    def _format_prompt(self, prompt: str, schema: str) -> Tuple[str, Optional[Dict[str, Any]]]:
         """Format the prompt based on the selected schema."""
+        responseSchema = self.schema_templates.get(schema)
+        if responseSchema is None:
+            return prompt, None
         prompt = f"{prompt}\nPlease respond with a JSON object."
-        return prompt, self.schema_templates[schema]
-    
+        return prompt, responseSchema
+
     def run(self):
         """Start the UI application."""
         self.root.mainloop()
+        self.cancelled.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     app = OllamaPromptUI()
@@ -0,0 +1,132 @@
+import os
+import sys
+import asyncio
+
+import pytest
+from ollama import Client, AsyncClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ai.backend.EndpointPool import EndpointPool, LEAST_OUTSTANDING, MODEL_AFFINITY
+from ai.bench.FakeOllamaServer import FakeOllamaServer
+
+
+@pytest.fixture
+def nodes():
+    servers = [FakeOllamaServer().start(), FakeOllamaServer().start()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def generate(url: str, model: str = "m"):
+    return Client(host=url).generate(model=model, prompt="hello")
+
+
+def served_by(nodes, url: str) -> FakeOllamaServer:
+    return next(node for node in nodes if node.url == url)
+
+
+def test_least_outstanding_spreads_requests(nodes):
+    pool = EndpointPool([node.url for node in nodes], LEAST_OUTSTANDING)
+    first = pool.select("m")
+    with pool._track(first):
+        second = pool.select("m")
+    assert second is not first
+    assert pool.call("m", generate).response
+
+
+def test_model_affinity_prefers_the_node_with_the_model_loaded(nodes):
+    pool = EndpointPool([node.url for node in nodes], MODEL_AFFINITY)
+    nodes[1].loadedModels.append("m")
+    pool.check_health()
+    assert pool.select("m").url == nodes[1].url
+    for _ in range(3):
+        pool.call("m", generate)
+    assert len(nodes[1].requests) == 3
+    assert not nodes[0].requests
+
+
+def test_model_affinity_pins_an_unloaded_model_to_one_node(nodes):
+    pool = EndpointPool([node.url for node in nodes], MODEL_AFFINITY)
+    urls = {pool.call("m", lambda url: (generate(url), url)[1]) for _ in range(3)}
+    assert len(urls) == 1
+
+
+def test_call_fails_over_to_a_healthy_node(nodes):
+    pool = EndpointPool([node.url for node in nodes], MODEL_AFFINITY)
+    failing = served_by(nodes, pool.select("m").url)
+    failing.failing = True
+    assert pool.call("m", generate).response
+    endpoint = next(endpoint for endpoint in pool.endpoints if endpoint.url == failing.url)
+    assert not endpoint.healthy
+    assert len(failing.requests) == 1
+    # Cooling down, so the next call does not try it first
+    pool.call("m", generate)
+    assert len(failing.requests) == 1
+
+
+def test_stream_fails_over_before_the_first_chunk(nodes):
+    pool = EndpointPool([node.url for node in nodes], MODEL_AFFINITY)
+    failing = served_by(nodes, pool.select("m").url)
+    failing.failing = True
+    chunks = list(pool.iterate("m", lambda url: Client(host=url).generate(model="m", prompt="hello", stream=True)))
+    assert chunks and chunks[-1].done
+
+
+def test_every_node_down_raises(nodes):
+    pool = EndpointPool([node.url for node in nodes], LEAST_OUTSTANDING)
+    for node in nodes:
+        node.failing = True
+    with pytest.raises(Exception):
+        pool.call("m", generate)
+
+
+def test_node_is_probed_after_its_cooldown(nodes):
+    # least_outstanding picks the first of the idle nodes, the failing one once it is healthy
+    pool = EndpointPool([node.url for node in nodes], LEAST_OUTSTANDING, cooldown=0.0)
+    failing, endpoint = nodes[0], pool.endpoints[0]
+    failing.failing = True
+    pool.call("m", generate)
+    assert not endpoint.healthy
+
+    # Still down: the probe fails, a new cooldown starts and no request is sent to it
+    pool.cooldown = 60.0
+    endpoint.unhealthySince -= 60.0
+    pool.call("m", generate)
+    assert not endpoint.healthy
+    assert endpoint.unhealthySince is not None and not endpoint.probing
+    assert len(failing.requests) == 1
+
+    # Back up: the probe marks it healthy before the request is routed
+    failing.failing = False
+    endpoint.unhealthySince -= 60.0
+    pool.call("m", generate)
+    assert endpoint.healthy
+    assert len(failing.requests) == 2
+
+
+def test_async_probe_and_failover(nodes):
+    pool = EndpointPool([node.url for node in nodes], LEAST_OUTSTANDING, cooldown=0.0)
+    failing = nodes[0]
+    failing.failing = True
+
+    async def agenerate(url: str):
+        return await AsyncClient(host=url).generate(model="m", prompt="hello")
+
+    async def run():
+        await pool.acall("m", agenerate)
+        failing.failing = False
+        await pool.acall("m", agenerate)
+
+    asyncio.run(run())
+    assert all(endpoint.healthy for endpoint in pool.endpoints)
+    assert len(failing.requests) == 2
+
+
+def test_check_health_marks_a_down_node(nodes):
+    pool = EndpointPool([node.url for node in nodes])
+    nodes[0].failing = True
+    asyncio.run(pool.acheck_health())
+    healthy = {endpoint.url: endpoint.healthy for endpoint in pool.endpoints}
+    assert healthy == {nodes[0].url: False, nodes[1].url: True}
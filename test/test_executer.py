@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import ai.operators.executer as executer
+from ai.operators.executer import aexecute_plan, invalid_steps, step_ids
+
+
+def step(stepId, *depends_on, command="pwd", **extra):
+    return {"id": stepId, "action": "run_shell_command", "command": command, "depends_on": list(depends_on), **extra}
+
+
+def run_plan(steps, **kwargs):
+    return asyncio.run(asyncio.wait_for(aexecute_plan(steps, **kwargs), 10))
+
+
+def test_step_ids_number_missing_and_repeated_ids():
+    assert step_ids([{"id": "a"}, {}, {"id": "a"}]) == ["a", "2", "a#3"]
+
+
+def test_valid_dag_has_no_invalid_steps():
+    assert invalid_steps([step("a"), step("b", "a"), step("c", "a", "b")]) == {}
+
+
+def test_unknown_dependency():
+    assert invalid_steps([step("a", "missing")]) == {"a": "Unknown dependency missing"}
+
+
+def test_cycle_and_the_steps_behind_it():
+    invalid = invalid_steps([step("a", "c"), step("b", "a"), step("c", "b"), step("d", "c"), step("e")])
+    assert invalid == {"a": "Dependency cycle", "b": "Dependency cycle", "c": "Dependency cycle", "d": "Dependency cycle"}
+
+
+def test_self_dependency_is_a_cycle():
+    assert invalid_steps([step("a", "a")]) == {"a": "Dependency cycle"}
+
+
+def test_numeric_ids_match_string_dependencies():
+    assert invalid_steps([step(1), step(2, "1")]) == {}
+
+
+def test_plan_runs_dependencies_first(monkeypatch):
+    finished = []
+
+    async def fake(llm_output, timeout, onChunk=None):
+        await asyncio.sleep(0.05 if llm_output["id"] == "a" else 0)
+        finished.append(llm_output["id"])
+        return {"stdout": llm_output["id"], "returncode": 0}
+
+    monkeypatch.setattr(executer, "aprocess_command", fake)
+    results = run_plan([step("c", "b"), step("b", "a"), step("a")])
+    assert finished == ["a", "b", "c"]
+    assert list(results) == ["c", "b", "a"]
+
+
+def test_independent_steps_run_concurrently(monkeypatch):
+    async def fake(llm_output, timeout, onChunk=None):
+        await asyncio.sleep(0.2)
+        return {"returncode": 0}
+
+    monkeypatch.setattr(executer, "aprocess_command", fake)
+    start = time.time()
+    run_plan([step("a"), step("b"), step("c")])
+    assert time.time() - start < 0.5
+
+
+def test_failed_step_skips_its_dependents_only():
+    results = run_plan([step("a", command="rm"), step("b", "a"), step("c", "b"), step("d")])
+    assert results["a"] == {"error": "Command not allowed"}
+    assert results["b"] == {"error": "Skipped, step a failed"}
+    assert results["c"] == {"error": "Skipped, step b failed"}
+    assert results["d"]["returncode"] == 0
+
+
+def test_nonzero_exit_counts_as_failure():
+    results = run_plan([step("a", command="ls", command_args="/does/not/exist"), step("b", "a")])
+    assert results["a"]["returncode"] != 0
+    assert results["b"] == {"error": "Skipped, step a failed"}
+
+
+def test_invalid_steps_are_reported_not_run():
+    results = run_plan([step("a", "b"), step("b", "a"), step("c", "missing"), step("d")])
+    assert results["a"] == {"error": "Dependency cycle"}
+    assert results["c"] == {"error": "Unknown dependency missing"}
+    assert results["d"]["returncode"] == 0
+
+
+def test_step_that_raises_resolves_its_dependents():
+    results = run_plan([step("a", command="ls", command_args=["-l"]), step("b", "a")])
+    assert "error" in results["a"]
+    assert results["b"] == {"error": "Skipped, step a failed"}
+
+
+def test_output_is_labelled_with_the_step_id():
+    chunks = []
+    run_plan([step("first")], onChunk=lambda stream, text: chunks.append(stream))
+    assert chunks and set(chunks) == {"first/stdout"}
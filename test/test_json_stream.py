@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ai.agents.JsonStream import JsonItemStream, item_schema, parse_structured
+
+CHAPTER = {
+    "type": "object",
+    "properties": {"title": {"type": "string"}, "keyEvents": {"type": "array", "items": {"type": "string"}}},
+    "required": ["title", "keyEvents"],
+}
+OUTLINE = {"type": "object", "properties": {"chapters": {"type": "array", "items": CHAPTER}}, "required": ["chapters"]}
+
+
+def feed_in_chunks(stream: JsonItemStream, text: str, size: int):
+    items = []
+    for start in range(0, len(text), size):
+        items += stream.feed(text[start:start + size])
+    return items + stream.finish()
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_elements_come_out_whatever_the_chunking(size):
+    document = {"note": "x", "chapters": [{"title": "A", "keyEvents": ["a", "b"]}, {"title": "B [2]", "keyEvents": ["c, d"]}]}
+    stream = JsonItemStream("chapters", CHAPTER)
+    items = feed_in_chunks(stream, json.dumps(document), size)
+    assert [item.value for item in items] == document["chapters"]
+    assert all(item.valid for item in items)
+    assert [item.index for item in items] == [0, 1]
+    assert stream.closed
+
+
+def test_each_element_is_handed_out_when_it_closes():
+    stream = JsonItemStream("chapters", CHAPTER)
+    assert stream.feed('{"chapters": [{"title": "A", "keyEvents": []') == []
+    items = stream.feed('}, {"title"')
+    assert [item.value["title"] for item in items] == ["A"]
+    assert not stream.closed
+
+
+def test_only_the_requested_array_is_scanned():
+    text = '{"other": [1, 2], "nested": {"chapters": [3]}, "chapters": [4, 5]}'
+    stream = JsonItemStream("chapters")
+    assert [item.value for item in stream.feed(text)] == [4, 5]
+
+
+def test_scalar_and_string_elements():
+    stream = JsonItemStream("values")
+    items = stream.feed('{"values": [1, -2.5, true, null, "a \\"quoted\\" ]", "x"]}')
+    assert [item.value for item in items] == [1, -2.5, True, None, 'a "quoted" ]', "x"]
+    assert stream.closed
+
+
+def test_invalid_elements_are_reported_not_dropped():
+    stream = JsonItemStream("chapters", CHAPTER)
+    items = stream.feed('{"chapters": [{"title": 1, "keyEvents": []}, {"title": "B", "keyEvents": []}]}')
+    assert not items[0].valid and "title" in items[0].error
+    assert items[1].valid
+    assert stream.values()[1] == {"title": "B", "keyEvents": []}
+
+
+def test_malformed_element_keeps_its_raw_text():
+    stream = JsonItemStream("values")
+    items = stream.feed('{"values": [tru, 2]}')
+    assert items[0].error.startswith("invalid JSON") and items[0].raw == "tru"
+    assert items[1].value == 2
+
+
+def test_cut_off_stream_reports_the_open_element():
+    stream = JsonItemStream("chapters", CHAPTER)
+    items = stream.feed('{"chapters": [{"title": "A", "keyEvents": []}, {"title": "B", "keyE')
+    rest = stream.finish()
+    assert len(items) == 1 and len(rest) == 1
+    assert rest[0].index == 1 and "incomplete" in rest[0].error
+    assert not stream.closed
+
+
+def test_empty_array_closes_without_elements():
+    stream = JsonItemStream("chapters")
+    assert stream.feed('{"chapters": []}') == []
+    assert stream.finish() == []
+    assert stream.closed
+
+
+def test_item_schema():
+    assert item_schema(OUTLINE, "chapters") is CHAPTER
+    assert item_schema(OUTLINE, "missing") is None
+
+
+def test_parse_structured_validates_and_repairs():
+    assert parse_structured('{"chapters": []}', OUTLINE) == {"chapters": []}
+    with pytest.raises(ValueError):
+        parse_structured('{"chapters": [{"title": 1}]}', OUTLINE)
+    assert parse_structured('{"chapters": [],}', OUTLINE) == {"chapters": []}
+    with pytest.raises(ValueError):
+        parse_structured('{"chapters": [', OUTLINE, repair=False)